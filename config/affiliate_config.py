@@ -49,6 +49,18 @@ AFFILIATE_SETTINGS = {
 }
 
 
+# Precomputed (tag, param_name, enabled) per lowercase platform name
+_AFFILIATE_LOOKUP = {
+    platform.lower(): (config['tag'], config['param_name'], config['enabled'])
+    for platform, config in AFFILIATE_CONFIG.items()
+}
+
+
+def _lookup(platform: str):
+    """Find the precomputed entry, lowercasing only on a miss"""
+    return _AFFILIATE_LOOKUP.get(platform) or _AFFILIATE_LOOKUP.get(platform.lower())
+
+
 def get_affiliate_tag(platform: str) -> str:
     """
     Get affiliate tag for a platform
@@ -59,10 +71,8 @@ def get_affiliate_tag(platform: str) -> str:
     Returns:
         Affiliate tag/ID
     """
-    config = AFFILIATE_CONFIG.get(platform.lower())
-    if config and config.get('enabled'):
-        return config.get('tag', '')
-    return ''
+    entry = _lookup(platform)
+    return entry[0] if entry and entry[2] else ''
 
 
 def is_affiliate_enabled(platform: str) -> bool:
@@ -75,8 +85,8 @@ def is_affiliate_enabled(platform: str) -> bool:
     Returns:
         True if enabled, False otherwise
     """
-    config = AFFILIATE_CONFIG.get(platform.lower())
-    return config.get('enabled', False) if config else False
+    entry = _lookup(platform)
+    return entry[2] if entry else False
 
 
 def get_param_name(platform: str) -> str:
@@ -89,5 +99,5 @@ def get_param_name(platform: str) -> str:
     Returns:
         Parameter name (e.g., 'tag', 'affid')
     """
-    config = AFFILIATE_CONFIG.get(platform.lower())
-    return config.get('param_name', 'tag') if config else 'tag'
+    entry = _lookup(platform)
+    return entry[1] if entry else 'tag'
@@ -0,0 +1,74 @@
+"""
+Bot Settings
+All environment-driven settings, parsed once at import
+"""
+import os
+from dataclasses import dataclass
+from typing import FrozenSet, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+@dataclass(frozen=True)
+class BotConfig:
+    """Immutable bot configuration"""
+    bot_token: Optional[str]
+    admin_user_ids: FrozenSet[int]
+
+    # Database
+    mongodb_uri: Optional[str]
+    mongodb_uri_secondary: Optional[str]
+    db_name: str
+    mongodb_connect_timeout: int
+    mongodb_server_selection_timeout: int
+    mongodb_max_pool_size: int
+    mongodb_min_pool_size: int
+    max_price_history: int
+
+    # Scheduling
+    check_interval: int
+    batch_size: int
+    cleanup_days: int
+    scrape_concurrency: int
+
+    # Notifications and caching
+    notification_batch_size: int
+    stats_cache_ttl: int
+
+    # Logging
+    log_level: str
+    log_file: str
+
+
+def _parse_ids(value: str) -> FrozenSet[int]:
+    """Parse a comma separated list of Telegram IDs"""
+    return frozenset(int(part) for part in value.split(",") if part.strip())
+
+
+def load_config() -> BotConfig:
+    """Read settings from the environment"""
+    return BotConfig(
+        bot_token=os.getenv("BOT_TOKEN"),
+        admin_user_ids=_parse_ids(os.getenv("ADMIN_USER_IDS", "")),
+        mongodb_uri=os.getenv("MONGODB_URI"),
+        mongodb_uri_secondary=os.getenv("MONGODB_URI_SECONDARY") or None,
+        db_name=os.getenv("DB_NAME", "price_tracker_bot"),
+        mongodb_connect_timeout=int(os.getenv("MONGODB_CONNECT_TIMEOUT", 5000)),
+        mongodb_server_selection_timeout=int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT", 5000)),
+        mongodb_max_pool_size=int(os.getenv("MONGODB_MAX_POOL_SIZE", 50)),
+        mongodb_min_pool_size=int(os.getenv("MONGODB_MIN_POOL_SIZE", 10)),
+        max_price_history=int(os.getenv("MAX_PRICE_HISTORY", 500)),
+        check_interval=int(os.getenv("CHECK_INTERVAL", 3600)),
+        batch_size=int(os.getenv("BATCH_SIZE", 100)),
+        cleanup_days=int(os.getenv("AUTO_CLEANUP_DAYS", 90)),
+        scrape_concurrency=int(os.getenv("SCRAPE_CONCURRENCY", 10)),
+        notification_batch_size=int(os.getenv("NOTIFICATION_BATCH_SIZE", 30)),
+        stats_cache_ttl=int(os.getenv("STATS_CACHE_TTL", 30)),
+        log_level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        log_file=os.getenv("LOG_FILE", "/tmp/bot.log")
+    )
+
+
+# Global instance
+CONFIG = load_config()
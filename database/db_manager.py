@@ -1,19 +1,336 @@
 """
 Database Manager with Multi-MongoDB Support and Affiliate URL Handling
 """
-import os
+import time
+import asyncio
 import logging
-from typing import Optional, List, Dict
+from abc import ABC, abstractmethod
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Optional, List, Dict
 from datetime import datetime, timedelta
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
-from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
+from pydantic import TypeAdapter
+from pymongo import UpdateOne
+from pymongo.errors import (
+    BulkWriteError, ConnectionFailure, OperationFailure, ServerSelectionTimeoutError
+)
+from config.settings import CONFIG
 from database.models import (
-    ProductTracking, User, CommunityAlert, 
+    ProductTracking, User, CommunityAlert, PriceHistory,
     AdminAnnouncement, BotHealth, Analytics
 )
 
 logger = logging.getLogger(__name__)
 
+# Fields read by price checks and the alerts they send; the embedded
+# history and bookkeeping fields stay on the server
+SCHEDULER_PROJECTION = {
+    "user_id": 1,
+    "product_url": 1,
+    "original_url": 1,
+    "affiliate_url": 1,
+    "platform": 1,
+    "product_id": 1,
+    "product_name": 1,
+    "current_price": 1,
+    "alert_settings": 1,
+    "alert_count": 1,
+    "last_checked": 1
+}
+
+# Fields rendered by /mytrackings
+USER_LISTING_PROJECTION = {
+    "product_name": 1,
+    "platform": 1,
+    "current_price": 1,
+    "affiliate_url": 1,
+    "is_paused": 1,
+    "first_price": 1
+}
+
+
+def _from_db(model_cls, doc: Dict):
+    """Build a model from a database document"""
+    # Models declare id as str; the driver returns an ObjectId
+    if doc.get('_id') is not None:
+        doc['_id'] = str(doc['_id'])
+    return model_cls.model_validate(doc)
+
+
+# Validates a whole result list in one call instead of one per document
+_TRACKING_LIST = TypeAdapter(List[ProductTracking])
+
+
+def _trackings_from_db(docs: List[Dict]) -> List[ProductTracking]:
+    """Build tracking models from a list of database documents"""
+    for doc in docs:
+        doc['_id'] = str(doc['_id'])
+    return _TRACKING_LIST.validate_python(docs)
+
+
+def _price_update(
+    tracking_id: str,
+    new_price: float,
+    stock_status: str = "in_stock",
+    discount: Optional[float] = None,
+    now: Optional[datetime] = None
+) -> tuple:
+    """Build the tracking update and price history document for a new price"""
+    from bson import ObjectId
+    
+    if now is None:
+        now = datetime.utcnow()
+    price_entry = {
+        "price": new_price,
+        "currency": "INR",
+        "timestamp": now,
+        "stock_status": stock_status,
+        "discount": discount
+    }
+    
+    update = UpdateOne(
+        {"_id": ObjectId(tracking_id)},
+        {
+            "$set": {
+                "current_price": new_price,
+                "updated_at": now,
+                "last_checked": now
+            },
+            # Only the recent window is embedded, the price_history
+            # collection keeps every entry
+            "$push": {"price_history": {
+                "$each": [price_entry],
+                "$slice": -CONFIG.max_price_history
+            }},
+            "$inc": {"check_count": 1},
+            # Kept on the document so nothing has to scan the history
+            "$min": {"lowest_price": new_price},
+            "$max": {"highest_price": new_price}
+        }
+    )
+    history = {"tracking_id": ObjectId(tracking_id), **price_entry}
+    return update, history
+
+
+def _seed_price_stats(document: Dict) -> Dict:
+    """Give a new tracking document its first price and $min/$max baselines"""
+    current_price = document.get('current_price')
+    if document.get('first_price') is None:
+        document['first_price'] = current_price
+    for field in ('lowest_price', 'highest_price'):
+        if document.get(field) is None:
+            if current_price is None:
+                # $min against null never moves, a missing field is set by it
+                document.pop(field, None)
+            else:
+                document[field] = current_price
+    return document
+
+
+def _failed_indexes(error: BulkWriteError) -> set:
+    """Positions of the operations a bulk write didn't apply"""
+    return {write_error['index'] for write_error in error.details.get('writeErrors', [])}
+
+
+class _WriteBuffer(ABC):
+    """
+    Collects writes and flushes them in bulk
+    
+    Writes are flushed once max_size are pending or interval seconds after
+    the first pending write, whichever comes first. Inside batch() the
+    timed flushes are held so a whole cycle is written at once. Call
+    flush() on shutdown. Subclasses keep the pending writes and implement
+    _pending() and _write(). A write that fails keeps what wasn't applied
+    pending for the next flush and re-raises.
+    """
+    
+    name = "writes"
+    
+    def __init__(self, manager: "DatabaseManager", max_size: int = 500, interval: float = 1.0):
+        self.manager = manager
+        self.max_size = max_size
+        self.interval = interval
+        
+        self._lock: Optional[asyncio.Lock] = None
+        self._timer: Optional[asyncio.Task] = None
+        self._holding = 0
+    
+    @abstractmethod
+    def _pending(self) -> int:
+        """Number of writes waiting to be flushed"""
+    
+    @abstractmethod
+    async def _write(self) -> int:
+        """Write and clear the pending writes, returning how many there were"""
+    
+    @staticmethod
+    async def _write_pending(pending: List, write: Callable[[List], Awaitable]) -> int:
+        """
+        Write the pending operations with write() and drop them from pending
+        
+        Operations added while the write is in flight stay pending. If the
+        write fails, only the operations the server applied are dropped; the
+        rest stay at the front of pending and the error is re-raised.
+        """
+        operations = pending[:]
+        if not operations:
+            return 0
+        
+        try:
+            await write(operations)
+        except BulkWriteError as e:
+            failed = _failed_indexes(e)
+            pending[:len(operations)] = [
+                operation for index, operation in enumerate(operations) if index in failed
+            ]
+            raise
+        
+        del pending[:len(operations)]
+        return len(operations)
+    
+    async def _added(self):
+        """Flush when full, otherwise make sure a timed flush is scheduled"""
+        if self._pending() >= self.max_size:
+            await self.flush()
+        elif not self._holding and (self._timer is None or self._timer.done()):
+            self._timer = asyncio.create_task(self._flush_later())
+    
+    @asynccontextmanager
+    async def batch(self):
+        """Hold timed flushes until the block ends, then write everything at once"""
+        self._holding += 1
+        try:
+            yield self
+        finally:
+            self._holding -= 1
+            if not self._holding:
+                await self.flush()
+    
+    async def _flush_later(self):
+        """Flush after the buffering interval"""
+        await asyncio.sleep(self.interval)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Error flushing {self.name}: {e}")
+    
+    async def flush(self):
+        """Write all pending writes"""
+        # Created lazily so it binds to the running event loop
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        
+        async with self._lock:
+            if not self._pending():
+                return
+            
+            count = await self._write()
+            logger.debug(f"Flushed {count} {self.name}")
+
+
+class PriceUpdateBuffer(_WriteBuffer):
+    """Collects price updates and their history entries"""
+    
+    name = "price updates"
+    
+    def __init__(self, manager: "DatabaseManager", max_size: int = 500, interval: float = 1.0):
+        super().__init__(manager, max_size, interval)
+        self._updates: List[UpdateOne] = []
+        self._history: List[Dict] = []
+    
+    async def add(
+        self,
+        tracking_id: str,
+        new_price: float,
+        stock_status: str = "in_stock",
+        discount: Optional[float] = None,
+        checked_at: Optional[datetime] = None
+    ):
+        """Queue a price update, timestamped checked_at (default now)"""
+        update, history = _price_update(tracking_id, new_price, stock_status, discount, checked_at)
+        self._updates.append(update)
+        self._history.append(history)
+        await self._added()
+    
+    def _pending(self) -> int:
+        # History can be left over when only its insert failed
+        return max(len(self._updates), len(self._history))
+    
+    async def _write(self) -> int:
+        db = self.manager.db
+        count = await self._write_pending(
+            self._updates,
+            lambda updates: db.trackings.bulk_write(updates, ordered=False)
+        )
+        await self._write_pending(
+            self._history,
+            lambda history: db.price_history.insert_many(history, ordered=False)
+        )
+        return count
+
+
+class AlertStatsBuffer(_WriteBuffer):
+    """Collects the tracking and user counters bumped by sent alerts"""
+    
+    name = "alert stats"
+    
+    def __init__(self, manager: "DatabaseManager", max_size: int = 500, interval: float = 0.2):
+        super().__init__(manager, max_size, interval)
+        self._trackings: List[UpdateOne] = []
+        self._user_alerts: Counter = Counter()
+    
+    async def add(self, user_id: int, tracking_ids: List[str], sent_at: Optional[datetime] = None):
+        """Record that alerts for tracking_ids were sent to user_id"""
+        from bson import ObjectId
+        
+        if sent_at is None:
+            sent_at = datetime.utcnow()
+        for tracking_id in tracking_ids:
+            self._trackings.append(UpdateOne(
+                {"_id": ObjectId(tracking_id)},
+                {
+                    "$set": {"last_alert_sent": sent_at},
+                    "$inc": {"alert_count": 1}
+                }
+            ))
+        self._user_alerts[user_id] += len(tracking_ids)
+        await self._added()
+    
+    def _pending(self) -> int:
+        # User counters can be left over when only their write failed
+        return max(len(self._trackings), len(self._user_alerts))
+    
+    async def _write(self) -> int:
+        db = self.manager.db
+        count = await self._write_pending(
+            self._trackings,
+            lambda trackings: db.trackings.bulk_write(trackings, ordered=False)
+        )
+        
+        user_alerts = list(self._user_alerts.items())
+        if not user_alerts:
+            return count
+        
+        # Alerts counted while the write is in flight are added to a fresh
+        # counter; unapplied counts are merged back into it on failure
+        self._user_alerts = Counter()
+        try:
+            await db.users.bulk_write([
+                UpdateOne({"user_id": user_id}, {"$inc": {"total_alerts_received": alerts}})
+                for user_id, alerts in user_alerts
+            ], ordered=False)
+        except BulkWriteError as e:
+            failed = _failed_indexes(e)
+            self._user_alerts.update(
+                {user_id: alerts for index, (user_id, alerts) in enumerate(user_alerts) if index in failed}
+            )
+            raise
+        except Exception:
+            self._user_alerts.update(dict(user_alerts))
+            raise
+        return count
+
 
 class DatabaseManager:
     """
@@ -21,26 +338,44 @@ class DatabaseManager:
     """
     
     def __init__(self):
-        self.primary_uri = os.getenv("MONGODB_URI")
-        self.secondary_uri = os.getenv("MONGODB_URI_SECONDARY", None)
+        self.primary_uri = CONFIG.mongodb_uri
+        self.secondary_uri = CONFIG.mongodb_uri_secondary
         
         self.primary_client: Optional[AsyncIOMotorClient] = None
         self.secondary_client: Optional[AsyncIOMotorClient] = None
         
         self.current_client: Optional[AsyncIOMotorClient] = None
         self.db: Optional[AsyncIOMotorDatabase] = None
-        self.db_name = os.getenv("DB_NAME", "price_tracker_bot")
+        self.db_name = CONFIG.db_name
         
         self.is_connected = False
+        self.is_replica_set = False
+        
+        # Batched writers for scheduled price checks and the alerts they send
+        self.price_updates = PriceUpdateBuffer(self)
+        self.alert_stats = AlertStatsBuffer(self)
+        
+        # Short-lived cache for admin statistics
+        self.stats_cache_ttl = CONFIG.stats_cache_ttl
+        self._stats_cache: Optional[Dict] = None
+        self._stats_cached_at = 0.0
+        self._stats_lock: Optional[asyncio.Lock] = None
+    
+    def _create_client(self, uri: str) -> AsyncIOMotorClient:
+        """Create a pooled client; one per URI is shared for the whole process"""
+        return AsyncIOMotorClient(
+            uri,
+            connectTimeoutMS=CONFIG.mongodb_connect_timeout,
+            serverSelectionTimeoutMS=CONFIG.mongodb_server_selection_timeout,
+            maxPoolSize=CONFIG.mongodb_max_pool_size,
+            minPoolSize=CONFIG.mongodb_min_pool_size
+        )
     
     async def connect(self):
         """Connect to MongoDB with failover support"""
         try:
             # Try primary connection
-            self.primary_client = AsyncIOMotorClient(
-                self.primary_uri,
-                serverSelectionTimeoutMS=5000
-            )
+            self.primary_client = self._create_client(self.primary_uri)
             await self.primary_client.admin.command('ping')
             
             self.current_client = self.primary_client
@@ -49,20 +384,24 @@ class DatabaseManager:
             
             logger.info("✅ Connected to primary MongoDB")
             
-            # Try secondary connection if available
+            # Only probe the secondary: an open client would keep its own
+            # connection pool and topology monitor idle for the whole run
             if self.secondary_uri:
+                probe_client = self._create_client(self.secondary_uri)
                 try:
-                    self.secondary_client = AsyncIOMotorClient(
-                        self.secondary_uri,
-                        serverSelectionTimeoutMS=5000
-                    )
-                    await self.secondary_client.admin.command('ping')
+                    await probe_client.admin.command('ping')
                     logger.info("✅ Secondary MongoDB connection available")
                 except Exception as e:
                     logger.warning(f"Secondary MongoDB unavailable: {e}")
+                finally:
+                    probe_client.close()
+            
+            await self._detect_replica_set()
             
             # Create indexes
+            await self._ensure_price_history_collection()
             await self._create_indexes()
+            await self._backfill_price_stats()
             
         except Exception as e:
             logger.error(f"❌ Primary MongoDB connection failed: {e}")
@@ -70,10 +409,7 @@ class DatabaseManager:
             # Try secondary if available
             if self.secondary_uri:
                 try:
-                    self.secondary_client = AsyncIOMotorClient(
-                        self.secondary_uri,
-                        serverSelectionTimeoutMS=5000
-                    )
+                    self.secondary_client = self._create_client(self.secondary_uri)
                     await self.secondary_client.admin.command('ping')
                     
                     self.current_client = self.secondary_client
@@ -81,7 +417,10 @@ class DatabaseManager:
                     self.is_connected = True
                     
                     logger.info("✅ Connected to secondary MongoDB")
+                    await self._detect_replica_set()
+                    await self._ensure_price_history_collection()
                     await self._create_indexes()
+                    await self._backfill_price_stats()
                     
                 except Exception as e2:
                     logger.error(f"❌ Secondary MongoDB also failed: {e2}")
@@ -89,6 +428,62 @@ class DatabaseManager:
             else:
                 raise e
     
+    async def _detect_replica_set(self):
+        """Check whether the server supports multi-document transactions"""
+        try:
+            hello = await self.current_client.admin.command('hello')
+            self.is_replica_set = bool(hello.get('setName'))
+        except Exception as e:
+            logger.warning(f"Could not detect replica set: {e}")
+            self.is_replica_set = False
+    
+    async def _ensure_price_history_collection(self):
+        """Create the price history time-series collection if missing"""
+        try:
+            existing = await self.db.list_collection_names(filter={"name": "price_history"})
+            if existing:
+                return
+            
+            try:
+                await self.db.create_collection(
+                    "price_history",
+                    timeseries={
+                        "timeField": "timestamp",
+                        "metaField": "tracking_id",
+                        "granularity": "hours"
+                    }
+                )
+            except OperationFailure:
+                # Servers before MongoDB 5.0 have no time-series collections
+                logger.warning("Time-series collections unsupported, using a regular collection")
+                await self.db.create_collection("price_history")
+            
+            logger.info("✅ Price history collection created")
+            
+        except Exception as e:
+            logger.error(f"Error creating price history collection: {e}")
+    
+    async def _backfill_price_stats(self):
+        """Set price stats on trackings created before they were maintained"""
+        try:
+            result = await self.db.trackings.update_many(
+                {
+                    "$or": [{"first_price": None}, {"lowest_price": None}],
+                    "price_history.0": {"$exists": True}
+                },
+                [{"$set": {
+                    "first_price": {"$ifNull": [
+                        "$first_price", {"$arrayElemAt": ["$price_history.price", 0]}
+                    ]},
+                    "lowest_price": {"$ifNull": ["$lowest_price", {"$min": "$price_history.price"}]},
+                    "highest_price": {"$ifNull": ["$highest_price", {"$max": "$price_history.price"}]}
+                }}]
+            )
+            if result.modified_count:
+                logger.info(f"Backfilled price stats on {result.modified_count} trackings")
+        except Exception as e:
+            logger.error(f"Error backfilling price stats: {e}")
+    
     async def _create_indexes(self):
         """Create necessary indexes"""
         try:
@@ -96,21 +491,33 @@ class DatabaseManager:
             await self.db.users.create_index("user_id", unique=True)
             await self.db.users.create_index("is_active")
             await self.db.users.create_index("is_premium")
+            await self.db.users.create_index("created_at")
             
             # Product trackings collection
-            await self.db.trackings.create_index("user_id")
             await self.db.trackings.create_index("product_url")
             await self.db.trackings.create_index("platform")
-            await self.db.trackings.create_index("is_active")
-            await self.db.trackings.create_index("is_paused")
-            await self.db.trackings.create_index([("user_id", 1), ("is_active", 1)])
-            await self.db.trackings.create_index("last_checked")
             await self.db.trackings.create_index("created_at")
+            # get_trackings_to_check: filter + sort served by the index
+            await self.db.trackings.create_index(
+                [("is_active", 1), ("is_paused", 1), ("last_checked", 1)]
+            )
+            # cleanup_old_data
+            await self.db.trackings.create_index([("is_active", 1), ("updated_at", 1)])
+            # get_user_trackings (also serves plain user_id lookups)
+            await self.db.trackings.create_index(
+                [("user_id", 1), ("is_active", 1), ("is_paused", 1)]
+            )
             
             # Community alerts
             await self.db.community_alerts.create_index("shared_by")
             await self.db.community_alerts.create_index("created_at")
             await self.db.community_alerts.create_index("expires_at")
+            await self.db.community_alerts.create_index(
+                [("shared_with", 1), ("expires_at", 1)]
+            )
+            
+            # Price history
+            await self.db.price_history.create_index([("tracking_id", 1), ("timestamp", 1)])
             
             # Analytics
             await self.db.analytics.create_index("date")
@@ -119,6 +526,28 @@ class DatabaseManager:
             
         except Exception as e:
             logger.error(f"Error creating indexes: {e}")
+        
+        # Single-key indexes superseded by the compound ones above
+        for index_name in (
+            "user_id_1", "is_active_1", "is_paused_1",
+            "last_checked_1", "user_id_1_is_active_1"
+        ):
+            try:
+                await self.db.trackings.drop_index(index_name)
+            except OperationFailure:
+                pass
+        
+        try:
+            # One active tracking per user and URL; duplicates left from
+            # before the index must be stopped or it can't be built
+            await self.deactivate_duplicate_trackings()
+            await self.db.trackings.create_index(
+                [("user_id", 1), ("product_url", 1)],
+                unique=True,
+                partialFilterExpression={"is_active": True}
+            )
+        except Exception as e:
+            logger.error(f"Error creating unique tracking index: {e}")
     
     async def disconnect(self):
         """Close database connections"""
@@ -134,14 +563,14 @@ class DatabaseManager:
     async def create_user(self, user_data: Dict) -> User:
         """Create a new user"""
         user = User(**user_data)
-        result = await self.db.users.insert_one(user.model_dump(by_alias=True, exclude=['id']))
-        user.id = result.inserted_id
+        result = await self.db.users.insert_one(user.to_document())
+        user.id = str(result.inserted_id)
         return user
     
     async def get_user(self, user_id: int) -> Optional[User]:
         """Get user by Telegram user ID"""
         user_data = await self.db.users.find_one({"user_id": user_id})
-        return User(**user_data) if user_data else None
+        return _from_db(User, user_data) if user_data else None
     
     async def update_user(self, user_id: int, update_data: Dict):
         """Update user data"""
@@ -151,21 +580,69 @@ class DatabaseManager:
             {"$set": update_data}
         )
     
+    async def deactivate_users(self, user_ids: List[int]):
+        """Mark users as inactive (e.g. after they blocked the bot)"""
+        if not user_ids:
+            return
+        
+        await self.db.users.update_many(
+            {"user_id": {"$in": user_ids}},
+            {"$set": {"is_active": False, "updated_at": datetime.utcnow()}}
+        )
+    
+    async def get_users_overview(self, page: int = 0, page_size: int = 50) -> List[Dict]:
+        """Get a page of users (newest first) with their tracking counts"""
+        users = await self.db.users.find(
+            {},
+            {"_id": 0, "user_id": 1, "username": 1, "last_activity": 1}
+        ).sort("created_at", -1).skip(page * page_size).limit(page_size).to_list(length=page_size)
+        
+        pipeline = [
+            {"$match": {"user_id": {"$in": [u["user_id"] for u in users]}}},
+            {"$group": {"_id": "$user_id", "count": {"$sum": 1}}}
+        ]
+        counts = {
+            doc["_id"]: doc["count"]
+            async for doc in self.db.trackings.aggregate(pipeline)
+        }
+        
+        for user in users:
+            user["trackings"] = counts.get(user["user_id"], 0)
+        
+        return users
+    
     # Product tracking operations
     async def add_tracking(self, tracking_data: Dict) -> ProductTracking:
-        """Add a new product tracking with affiliate URL"""
-        tracking = ProductTracking(**tracking_data)
+        """
+        Add a new product tracking with affiliate URL
+        
+        The document, its initial price history entries and the user stats
+        update are all stamped here with one timestamp.
+        """
+        now = datetime.utcnow()
+        tracking = ProductTracking(**{
+            **tracking_data,
+            "created_at": now,
+            "updated_at": now,
+            "price_history": [
+                {**entry, "timestamp": now}
+                for entry in tracking_data.get("price_history", [])
+            ]
+        })
         result = await self.db.trackings.insert_one(
-            tracking.model_dump(by_alias=True, exclude=['id'])
+            _seed_price_stats(tracking.to_document())
+        )
+        tracking.id = str(result.inserted_id)
+        await self._record_price_history(
+            [(tracking.id, entry) for entry in tracking.price_history]
         )
-        tracking.id = result.inserted_id
         
         # Update user stats
         await self.db.users.update_one(
             {"user_id": tracking_data['user_id']},
             {
                 "$inc": {"total_trackings": 1, "active_trackings": 1},
-                "$set": {"updated_at": datetime.utcnow()}
+                "$set": {"updated_at": now}
             }
         )
         
@@ -175,9 +652,105 @@ class DatabaseManager:
         self, 
         user_id: int, 
         active_only: bool = True,
-        include_paused: bool = False
+        include_paused: bool = False,
+        history_slice: Optional[int] = None
     ) -> List[ProductTracking]:
-        """Get all trackings for a user"""
+        """
+        Get all trackings for a user
+        
+        history_slice limits the embedded price history returned, e.g. 1 for
+        the first entry or -2 for the latest two; None returns all of it.
+        """
+        query = self._user_trackings_query(user_id, active_only, include_paused)
+        projection = {"price_history": {"$slice": history_slice}} if history_slice else None
+        
+        trackings = await self.db.trackings.find(query, projection).to_list(length=None)
+        return _trackings_from_db(trackings)
+    
+    async def get_user_trackings_raw(
+        self,
+        user_id: int,
+        active_only: bool = True,
+        include_paused: bool = False
+    ) -> List[Dict]:
+        """
+        Get a user's trackings as plain documents for listings
+        
+        Only the fields a listing renders are fetched and no models are built.
+        """
+        query = self._user_trackings_query(user_id, active_only, include_paused)
+        return await self.db.trackings.find(query, USER_LISTING_PROJECTION).to_list(length=None)
+    
+    async def count_user_trackings(
+        self,
+        user_id: int,
+        active_only: bool = True,
+        include_paused: bool = False
+    ) -> int:
+        """Count a user's trackings without fetching them"""
+        query = self._user_trackings_query(user_id, active_only, include_paused)
+        return await self.db.trackings.count_documents(query)
+    
+    async def get_price_changes(self, user_id: int, limit: int = 5) -> Dict:
+        """
+        Get a user's biggest recent price drops and increases
+        
+        The latest two history entries of each active tracking are compared
+        on the server, so only the top `limit` of each direction and the
+        tracking count come back. change_percent is signed.
+        """
+        query = self._user_trackings_query(user_id, active_only=True, include_paused=False)
+        fields = {"_id": 0, "product_name": 1, "current_price": 1, "affiliate_url": 1, "change_percent": 1}
+        
+        pipeline = [
+            {"$match": query},
+            {"$project": {
+                "product_name": 1,
+                "current_price": 1,
+                "affiliate_url": 1,
+                "recent": {"$slice": ["$price_history", -2]}
+            }},
+            {"$addFields": {"change_percent": {"$let": {
+                "vars": {
+                    "previous": {"$arrayElemAt": ["$recent.price", 0]},
+                    "latest": {"$arrayElemAt": ["$recent.price", 1]}
+                },
+                "in": {"$cond": [
+                    {"$and": [
+                        {"$eq": [{"$size": "$recent"}, 2]},
+                        {"$gt": ["$$previous", 0]},
+                        {"$ne": ["$$latest", "$$previous"]}
+                    ]},
+                    {"$multiply": [
+                        {"$divide": [{"$subtract": ["$$latest", "$$previous"]}, "$$previous"]},
+                        100
+                    ]},
+                    None
+                ]}
+            }}}},
+            {"$facet": {
+                "total": [{"$count": "count"}],
+                "drops": [
+                    {"$match": {"change_percent": {"$lt": 0}}},
+                    {"$sort": {"change_percent": 1}},
+                    {"$limit": limit},
+                    {"$project": fields}
+                ],
+                "increases": [
+                    {"$match": {"change_percent": {"$gt": 0}}},
+                    {"$sort": {"change_percent": -1}},
+                    {"$limit": limit},
+                    {"$project": fields}
+                ]
+            }}
+        ]
+        
+        result = (await self.db.trackings.aggregate(pipeline).to_list(length=1))[0]
+        total = result["total"][0]["count"] if result["total"] else 0
+        return {"total": total, "drops": result["drops"], "increases": result["increases"]}
+    
+    def _user_trackings_query(self, user_id: int, active_only: bool, include_paused: bool) -> Dict:
+        """Build the filter shared by the per-user tracking reads"""
         query = {"user_id": user_id}
         
         if active_only:
@@ -186,14 +759,29 @@ class DatabaseManager:
         if not include_paused:
             query["is_paused"] = False
         
-        trackings = await self.db.trackings.find(query).to_list(length=None)
-        return [ProductTracking(**t) for t in trackings]
+        return query
     
     async def get_tracking_by_id(self, tracking_id: str) -> Optional[ProductTracking]:
         """Get tracking by ID"""
         from bson import ObjectId
         tracking_data = await self.db.trackings.find_one({"_id": ObjectId(tracking_id)})
-        return ProductTracking(**tracking_data) if tracking_data else None
+        return _from_db(ProductTracking, tracking_data) if tracking_data else None
+    
+    async def get_tracking_summary(self, tracking_id: str, user_id: int) -> Optional[Dict]:
+        """Get a user's tracking with its stored price stats, without the history"""
+        from bson import ObjectId
+        
+        return await self.db.trackings.find_one(
+            {"_id": ObjectId(tracking_id), "user_id": user_id},
+            {
+                "product_name": 1, "platform": 1, "affiliate_url": 1,
+                "current_price": 1, "original_price": 1,
+                "is_active": 1, "is_paused": 1,
+                "created_at": 1, "check_count": 1, "alert_count": 1,
+                "notes": 1, "tags": 1,
+                "first_price": 1, "lowest_price": 1, "highest_price": 1
+            }
+        )
     
     async def update_tracking(self, tracking_id: str, update_data: Dict):
         """Update tracking data"""
@@ -213,29 +801,54 @@ class DatabaseManager:
         discount: Optional[float] = None
     ):
         """Update product price and add to history"""
+        update, history = _price_update(tracking_id, new_price, stock_status, discount)
+        
+        await self.db.price_history.insert_one(history)
+        await self.db.trackings.bulk_write([update])
+    
+    async def _record_price_history(self, entries: List[tuple]):
+        """Store (tracking_id, PriceHistory) pairs in the price history collection"""
         from bson import ObjectId
         
-        price_entry = {
-            "price": new_price,
-            "currency": "INR",
-            "timestamp": datetime.utcnow(),
-            "stock_status": stock_status,
-            "discount": discount
-        }
+        if not entries:
+            return
         
-        await self.db.trackings.update_one(
-            {"_id": ObjectId(tracking_id)},
-            {
-                "$set": {
-                    "current_price": new_price,
-                    "updated_at": datetime.utcnow(),
-                    "last_checked": datetime.utcnow()
-                },
-                "$push": {"price_history": price_entry},
-                "$inc": {"check_count": 1}
-            }
+        await self.db.price_history.insert_many(
+            [
+                {"tracking_id": ObjectId(str(tracking_id)), **entry.to_document()}
+                for tracking_id, entry in entries
+            ],
+            ordered=False
         )
     
+    async def get_price_history(
+        self,
+        tracking_id: str,
+        since: Optional[datetime] = None,
+        limit: Optional[int] = None
+    ) -> List[PriceHistory]:
+        """
+        Get the price history of a tracking, oldest first
+        
+        Read from the price_history collection, which unlike the embedded
+        array is never trimmed. With a limit only the latest entries are
+        returned.
+        """
+        from bson import ObjectId
+        
+        query = {"tracking_id": ObjectId(tracking_id)}
+        if since:
+            query["timestamp"] = {"$gte": since}
+        
+        cursor = self.db.price_history.find(query, {"_id": 0, "tracking_id": 0})
+        if limit:
+            entries = await cursor.sort("timestamp", -1).limit(limit).to_list(length=limit)
+            entries.reverse()
+        else:
+            entries = await cursor.sort("timestamp", 1).to_list(length=None)
+        
+        return [PriceHistory.model_validate(e) for e in entries]
+    
     async def pause_tracking(self, tracking_id: str):
         """Pause a tracking"""
         await self.update_tracking(tracking_id, {"is_paused": True})
@@ -246,43 +859,105 @@ class DatabaseManager:
     
     async def stop_tracking(self, tracking_id: str, user_id: int):
         """Stop tracking a product"""
-        await self.update_tracking(tracking_id, {"is_active": False})
+        from bson import ObjectId
+        now = datetime.utcnow()
         
-        # Update user stats
-        await self.db.users.update_one(
-            {"user_id": user_id},
-            {
-                "$inc": {"active_trackings": -1},
-                "$set": {"updated_at": datetime.utcnow()}
-            }
-        )
-    
-    async def get_all_active_trackings(self) -> List[ProductTracking]:
-        """Get all active trackings for scheduled scraping"""
-        trackings = await self.db.trackings.find({
-            "is_active": True,
-            "is_paused": False
-        }).to_list(length=None)
+        async def _stop(session=None):
+            await self.db.trackings.update_one(
+                {"_id": ObjectId(tracking_id)},
+                {"$set": {"is_active": False, "updated_at": now}},
+                session=session
+            )
+            
+            # Update user stats
+            await self.db.users.update_one(
+                {"user_id": user_id},
+                {
+                    "$inc": {"active_trackings": -1},
+                    "$set": {"updated_at": now}
+                },
+                session=session
+            )
         
-        return [ProductTracking(**t) for t in trackings]
+        if self.is_replica_set:
+            # Both writes commit together, so active_trackings can't drift
+            async with await self.current_client.start_session() as session:
+                await session.with_transaction(_stop)
+        else:
+            await _stop()
     
     async def get_trackings_to_check(self, limit: int = 100) -> List[ProductTracking]:
-        """Get trackings that need to be checked (oldest first)"""
-        trackings = await self.db.trackings.find({
-            "is_active": True,
-            "is_paused": False
-        }).sort("last_checked", 1).limit(limit).to_list(length=limit)
+        """
+        Get trackings that need to be checked (oldest first)
+        
+        Served by the (is_active, is_paused, last_checked) index, which
+        covers both the filter and the sort.
+        """
+        trackings = await self.db.trackings.find(
+            {"is_active": True, "is_paused": False},
+            SCHEDULER_PROJECTION
+        ).sort("last_checked", 1).limit(limit).to_list(length=limit)
+        
+        return _trackings_from_db(trackings)
+    
+    async def deactivate_duplicate_trackings(self) -> int:
+        """
+        Stop duplicate active trackings of the same URL, keeping the oldest
+        
+        The duplicates are stopped like stop_tracking does, so they and
+        their price history are removed with other stopped trackings by
+        cleanup_old_data. Once the unique index exists this finds nothing.
+        """
+        pipeline = [
+            {"$match": {"is_active": True}},
+            {"$sort": {"_id": 1}},
+            {"$group": {
+                "_id": {"user_id": "$user_id", "product_url": "$product_url"},
+                "ids": {"$push": "$_id"},
+                "count": {"$sum": 1}
+            }},
+            {"$match": {"count": {"$gt": 1}}}
+        ]
+        
+        to_stop = []
+        stopped_per_user = Counter()
+        async for group in self.db.trackings.aggregate(pipeline):
+            to_stop.extend(group["ids"][1:])
+            stopped_per_user[group["_id"]["user_id"]] += group["count"] - 1
         
-        return [ProductTracking(**t) for t in trackings]
+        if not to_stop:
+            return 0
+        
+        now = datetime.utcnow()
+        await self.db.trackings.update_many(
+            {"_id": {"$in": to_stop}},
+            {"$set": {"is_active": False, "updated_at": now}}
+        )
+        await self.db.users.bulk_write(
+            [
+                UpdateOne(
+                    {"user_id": user_id},
+                    {
+                        "$inc": {"active_trackings": -count},
+                        "$set": {"updated_at": now}
+                    }
+                )
+                for user_id, count in stopped_per_user.items()
+            ],
+            ordered=False
+        )
+        
+        logger.info(f"Stopped {len(to_stop)} duplicate trackings")
+        return len(to_stop)
     
     # Community alerts
     async def create_community_alert(self, alert_data: Dict) -> CommunityAlert:
         """Create a community alert"""
         alert = CommunityAlert(**alert_data)
         result = await self.db.community_alerts.insert_one(
-            alert.model_dump(by_alias=True, exclude=['id'])
+            alert.to_document()
         )
-        alert.id = result.inserted_id
+        alert.id = str(result.inserted_id)
         return alert
     
     async def get_community_alerts(self, user_id: int) -> List[CommunityAlert]:
@@ -292,14 +967,14 @@ class DatabaseManager:
             "expires_at": {"$gt": datetime.utcnow()}
         }).to_list(length=None)
         
-        return [CommunityAlert(**a) for a in alerts]
+        return [_from_db(CommunityAlert, a) for a in alerts]
     
     # Analytics
     async def record_analytics(self, analytics_data: Dict):
         """Record daily analytics"""
         analytics = Analytics(**analytics_data)
         await self.db.analytics.insert_one(
-            analytics.model_dump(by_alias=True, exclude=['id'])
+            analytics.to_document()
         )
     
     async def get_analytics(self, days: int = 7) -> List[Analytics]:
@@ -310,47 +985,105 @@ class DatabaseManager:
             "date": {"$gte": start_date}
         }).sort("date", -1).to_list(length=None)
         
-        return [Analytics(**a) for a in analytics]
+        return [_from_db(Analytics, a) for a in analytics]
     
     # Cleanup operations
+    async def _delete_in_chunks(
+        self,
+        collection,
+        query: Dict,
+        on_chunk=None,
+        chunk_size: int = 10000
+    ) -> int:
+        """Delete matching documents chunk by chunk, yielding between chunks"""
+        deleted = 0
+        while True:
+            docs = await collection.find(query, {"_id": 1}).limit(chunk_size).to_list(length=chunk_size)
+            if not docs:
+                break
+            
+            ids = [d["_id"] for d in docs]
+            await collection.delete_many({"_id": {"$in": ids}})
+            if on_chunk:
+                await on_chunk(ids)
+            deleted += len(ids)
+            
+            # Let other tasks run between chunks
+            await asyncio.sleep(0)
+        
+        return deleted
+    
     async def cleanup_old_data(self, days: int = 90):
         """Clean up old inactive data"""
         cutoff_date = datetime.utcnow() - timedelta(days=days)
         
-        # Delete old inactive trackings
-        result = await self.db.trackings.delete_many({
-            "is_active": False,
-            "updated_at": {"$lt": cutoff_date}
-        })
+        async def _delete_history(tracking_ids: List):
+            await self.db.price_history.delete_many({"tracking_id": {"$in": tracking_ids}})
         
-        logger.info(f"Cleaned up {result.deleted_count} old trackings")
+        # Delete old inactive trackings and their price history
+        deleted = await self._delete_in_chunks(
+            self.db.trackings,
+            {"is_active": False, "updated_at": {"$lt": cutoff_date}},
+            on_chunk=_delete_history
+        )
+        
+        logger.info(f"Cleaned up {deleted} old trackings")
         
         # Delete expired community alerts
-        result = await self.db.community_alerts.delete_many({
+        deleted = await self._delete_in_chunks(self.db.community_alerts, {
             "expires_at": {"$lt": datetime.utcnow()}
         })
         
-        logger.info(f"Cleaned up {result.deleted_count} expired community alerts")
+        logger.info(f"Cleaned up {deleted} expired community alerts")
     
-    async def get_stats(self) -> Dict:
-        """Get overall bot statistics"""
-        total_users = await self.db.users.count_documents({})
-        active_users = await self.db.users.count_documents({"is_active": True})
-        premium_users = await self.db.users.count_documents({"is_premium": True})
-        
-        total_trackings = await self.db.trackings.count_documents({})
-        active_trackings = await self.db.trackings.count_documents({
-            "is_active": True,
-            "is_paused": False
-        })
-        
+    async def _count_facets(self, collection, filters: Dict[str, Dict]) -> Dict[str, int]:
+        """Count documents for several filters in one $facet aggregation"""
+        pipeline = [{"$facet": {
+            name: ([{"$match": query}] if query else []) + [{"$count": "n"}]
+            for name, query in filters.items()
+        }}]
+        result = await collection.aggregate(pipeline).to_list(length=1)
+        facets = result[0] if result else {}
         return {
-            "total_users": total_users,
-            "active_users": active_users,
-            "premium_users": premium_users,
-            "total_trackings": total_trackings,
-            "active_trackings": active_trackings
+            name: facets[name][0]["n"] if facets.get(name) else 0
+            for name in filters
         }
+    
+    async def get_stats(self) -> Dict:
+        """Get overall bot statistics (cached for stats_cache_ttl seconds)"""
+        if self._stats_cache and time.monotonic() - self._stats_cached_at < self.stats_cache_ttl:
+            return dict(self._stats_cache)
+        
+        # Created lazily so it binds to the running event loop
+        if self._stats_lock is None:
+            self._stats_lock = asyncio.Lock()
+        
+        async with self._stats_lock:
+            # Another caller may have refreshed it while we waited
+            if self._stats_cache and time.monotonic() - self._stats_cached_at < self.stats_cache_ttl:
+                return dict(self._stats_cache)
+            
+            self._stats_cache = await self._compute_stats()
+            self._stats_cached_at = time.monotonic()
+        
+        return dict(self._stats_cache)
+    
+    async def _compute_stats(self) -> Dict:
+        """Count users and trackings"""
+        # The two collections are independent, so count them concurrently
+        users, trackings = await asyncio.gather(
+            self._count_facets(self.db.users, {
+                "total_users": {},
+                "active_users": {"is_active": True},
+                "premium_users": {"is_premium": True}
+            }),
+            self._count_facets(self.db.trackings, {
+                "total_trackings": {},
+                "active_trackings": {"is_active": True, "is_paused": False}
+            })
+        )
+        
+        return {**users, **trackings}
 
 # Global instance
 db_manager = DatabaseManager()
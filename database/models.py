@@ -3,14 +3,24 @@ Database Models for Price Tracker Bot
 """
 from datetime import datetime
 from typing import Optional, List, Dict, Any
-from pydantic import BaseModel, Field, ConfigDict, field_validator
-from bson import ObjectId
+from pydantic import BaseModel, Field, ConfigDict
 
 # Simple approach: Use string for ObjectId fields
 # This avoids Pydantic v2 complexity while maintaining functionality
 
 
-class PriceHistory(BaseModel):
+class MongoModel(BaseModel):
+    """Base for models stored in MongoDB"""
+    
+    def to_document(self) -> Dict[str, Any]:
+        """Mongo document for inserts, without a Python-side dump"""
+        document = self.__dict__.copy()
+        # The database assigns _id
+        document.pop('id', None)
+        return document
+
+
+class PriceHistory(MongoModel):
     """Price history entry"""
     price: float
     currency: str = "INR"
@@ -19,7 +29,7 @@ class PriceHistory(BaseModel):
     discount: Optional[float] = None
 
 
-class AlertSettings(BaseModel):
+class AlertSettings(MongoModel):
     """Alert configuration for a tracked product"""
     alert_type: str = "any_change"  # any_change, percentage_drop, fixed_price, stock_alert
     threshold: Optional[float] = None  # For percentage/fixed price alerts
@@ -28,7 +38,7 @@ class AlertSettings(BaseModel):
     notify_on_price_increase: bool = False
 
 
-class ProductTracking(BaseModel):
+class ProductTracking(MongoModel):
     """Product tracking model"""
     id: Optional[str] = Field(alias="_id", default=None)
     user_id: int
@@ -64,17 +74,21 @@ class ProductTracking(BaseModel):
     # Stats
     check_count: int = 0
     alert_count: int = 0
+    first_price: Optional[float] = None
     lowest_price: Optional[float] = None
     highest_price: Optional[float] = None
     
-    model_config = ConfigDict(
-        populate_by_name=True,
-        arbitrary_types_allowed=True,
-        json_encoders={ObjectId: str}
-    )
+    def to_document(self) -> Dict[str, Any]:
+        """Mongo document for inserts, with the nested models converted too"""
+        document = super().to_document()
+        document['alert_settings'] = self.alert_settings.to_document()
+        document['price_history'] = [entry.to_document() for entry in self.price_history]
+        return document
+    
+    model_config = ConfigDict(populate_by_name=True)
 
 
-class User(BaseModel):
+class User(MongoModel):
     """User model"""
     id: Optional[str] = Field(alias="_id", default=None)
     user_id: int
@@ -110,14 +124,10 @@ class User(BaseModel):
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     last_activity: datetime = Field(default_factory=datetime.utcnow)
     
-    model_config = ConfigDict(
-        populate_by_name=True,
-        arbitrary_types_allowed=True,
-        json_encoders={ObjectId: str}
-    )
+    model_config = ConfigDict(populate_by_name=True)
 
 
-class CommunityAlert(BaseModel):
+class CommunityAlert(MongoModel):
     """Community shared product alert"""
     id: Optional[str] = Field(alias="_id", default=None)
     shared_by: int
@@ -133,14 +143,10 @@ class CommunityAlert(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     expires_at: Optional[datetime] = None
     
-    model_config = ConfigDict(
-        populate_by_name=True,
-        arbitrary_types_allowed=True,
-        json_encoders={ObjectId: str}
-    )
+    model_config = ConfigDict(populate_by_name=True)
 
 
-class AdminAnnouncement(BaseModel):
+class AdminAnnouncement(MongoModel):
     """Admin announcement model"""
     id: Optional[str] = Field(alias="_id", default=None)
     message: str
@@ -149,14 +155,10 @@ class AdminAnnouncement(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     sent_at: Optional[datetime] = None
     
-    model_config = ConfigDict(
-        populate_by_name=True,
-        arbitrary_types_allowed=True,
-        json_encoders={ObjectId: str}
-    )
+    model_config = ConfigDict(populate_by_name=True)
 
 
-class BotHealth(BaseModel):
+class BotHealth(MongoModel):
     """Bot health monitoring"""
     id: Optional[str] = Field(alias="_id", default=None)
     scheduler_status: str = "running"
@@ -175,14 +177,10 @@ class BotHealth(BaseModel):
     
     errors: List[Dict] = Field(default_factory=list)
     
-    model_config = ConfigDict(
-        populate_by_name=True,
-        arbitrary_types_allowed=True,
-        json_encoders={ObjectId: str}
-    )
+    model_config = ConfigDict(populate_by_name=True)
 
 
-class Analytics(BaseModel):
+class Analytics(MongoModel):
     """Analytics data"""
     id: Optional[str] = Field(alias="_id", default=None)
     date: datetime = Field(default_factory=datetime.utcnow)
@@ -200,8 +198,4 @@ class Analytics(BaseModel):
     top_platforms: Dict[str, int] = Field(default_factory=dict)
     top_products: List[Dict] = Field(default_factory=list)
     
-    model_config = ConfigDict(
-        populate_by_name=True,
-        arbitrary_types_allowed=True,
-        json_encoders={ObjectId: str}
-    )
+    model_config = ConfigDict(populate_by_name=True)
@@ -2,35 +2,36 @@
 Admin handlers
 """
 from aiogram import Router, F
-from aiogram.types import Message
-from aiogram.filters import Command
-import os
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message, CallbackQuery
+from aiogram.filters import Command, CommandObject
+
+from config.settings import CONFIG
+from keyboards.inline_keyboards import get_pagination_keyboard
+from notifications.notifier import Notifier, escape_markdown, render_announcement
 
 router = Router()
 
-ADMIN_IDS = [int(id) for id in os.getenv("ADMIN_USER_IDS", "").split(",") if id.strip()]
+ADMIN_IDS = CONFIG.admin_user_ids
+
+ADMIN_TEXT = (
+    "👑 **Admin Panel**\n\n"
+    "/stats - Bot statistics\n"
+    "/announce - Send announcement\n"
+    "/users - User management"
+)
 
-def is_admin(user_id: int) -> bool:
-    return user_id in ADMIN_IDS
+# Checked once at dispatch, so updates from non-admins never reach the
+# handlers below and fall through to the other routers
+router.message.filter(F.from_user.id.in_(ADMIN_IDS))
+router.callback_query.filter(F.from_user.id.in_(ADMIN_IDS))
 
 @router.message(Command("admin"))
 async def cmd_admin(message: Message):
-    if not is_admin(message.from_user.id):
-        return
-    
-    await message.answer(
-        "👑 **Admin Panel**\n\n"
-        "/stats - Bot statistics\n"
-        "/announce - Send announcement\n"
-        "/users - User management",
-        parse_mode="Markdown"
-    )
+    await message.answer(ADMIN_TEXT, parse_mode="Markdown")
 
 @router.message(Command("stats"))
 async def cmd_stats(message: Message):
-    if not is_admin(message.from_user.id):
-        return
-    
     from database.db_manager import db_manager
     stats = await db_manager.get_stats()
     
@@ -43,3 +44,70 @@ async def cmd_stats(message: Message):
         f"🔔 Active Trackings: {stats['active_trackings']}",
         parse_mode="Markdown"
     )
+
+@router.message(Command("announce"))
+async def cmd_announce(message: Message, command: CommandObject, notifier: Notifier):
+    if not command.args:
+        await message.answer(
+            "📢 **Usage:** /announce <message>",
+            parse_mode="Markdown"
+        )
+        return
+    
+    # Sent to the admin first, so a message Telegram rejects fails once
+    # here instead of once per user
+    try:
+        await message.answer(render_announcement(command.args), parse_mode="Markdown")
+    except TelegramBadRequest as e:
+        await message.answer(f"❌ Announcement not sent, Telegram rejected it: {e.message}")
+        return
+    
+    status = await message.answer("📢 Sending announcement...")
+    
+    # Sent concurrently in rate-limited waves by the notifier
+    result = await notifier.send_admin_announcement(command.args)
+    
+    await status.edit_text(
+        f"📢 **Announcement Sent**\n\n"
+        f"✅ Delivered: {result['success']}\n"
+        f"❌ Failed: {result['failed']}",
+        parse_mode="Markdown"
+    )
+
+USERS_PAGE_SIZE = 30
+
+
+async def _render_users_page(page: int):
+    """Build text and keyboard for one page of the users list"""
+    from database.db_manager import db_manager
+    
+    # Fetch one extra row to know whether a next page exists
+    users = await db_manager.get_users_overview(page=page, page_size=USERS_PAGE_SIZE + 1)
+    has_next = len(users) > USERS_PAGE_SIZE
+    users = users[:USERS_PAGE_SIZE]
+    
+    if not users:
+        return "👥 No users on this page.", None
+    
+    lines = "\n".join(
+        f"`{u['user_id']}` @{escape_markdown(u.get('username')) or '-'} | "
+        f"📦 {u['trackings']} | "
+        f"🕒 {u['last_activity'].strftime('%d %b %Y') if u.get('last_activity') else '-'}"
+        for u in users
+    )
+    text = f"👥 **Users** (page {page + 1})\n\n{lines}"
+    return text, get_pagination_keyboard("users_page", page, has_next)
+
+
+@router.message(Command("users"))
+async def cmd_users(message: Message):
+    text, keyboard = await _render_users_page(0)
+    await message.answer(text, parse_mode="Markdown", reply_markup=keyboard)
+
+
+@router.callback_query(F.data.startswith("users_page:"))
+async def cb_users_page(callback: CallbackQuery):
+    page = max(int(callback.data.split(":", 1)[1]), 0)
+    text, keyboard = await _render_users_page(page)
+    await callback.message.edit_text(text, parse_mode="Markdown", reply_markup=keyboard)
+    await callback.answer()
@@ -2,12 +2,15 @@
 Tracking Handler with Affiliate Link Integration
 """
 import logging
-from datetime import datetime
+import re
+from html import escape
+from typing import Optional
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from pymongo.errors import DuplicateKeyError
 
 from database.db_manager import db_manager
 from utils.affiliate_manager import affiliate_manager
@@ -21,6 +24,10 @@ from keyboards.inline_keyboards import (
 logger = logging.getLogger(__name__)
 router = Router()
 
+# Common URL patterns. A single character class after the scheme keeps
+# matching linear in the message length (no nested quantifiers to backtrack).
+_URL_RE = re.compile(r'https?://[-a-zA-Z0-9()@:%_\+.~#?&/=]+')
+
 
 class TrackingStates(StatesGroup):
     """States for tracking workflow"""
@@ -30,15 +37,46 @@ class TrackingStates(StatesGroup):
     adding_notes = State()
 
 
-def extract_url_from_message(text: str) -> str:
-    """Extract URL from message text"""
-    import re
+PLATFORM_EMOJIS = {
+    "amazon": "📦",
+    "flipkart": "🛒",
+    "myntra": "👗",
+    "meesho": "🛍️",
+    "snapdeal": "🎁",
+    "ebay": "🏪"
+}
+
+
+# Latest price observations listed by /product
+PRODUCT_HISTORY_ENTRIES = 5
+
+
+MY_TRACKINGS_FOOTER = (
+    "💡 Use /product &lt;id&gt; for details\n"
+    "⏸️ Use /pause &lt;id&gt; to pause tracking\n"
+    "🛑 Use /stop &lt;id&gt; to stop tracking"
+)
+
+
+def format_price_change(old_price: Optional[float], new_price: Optional[float]) -> str:
+    """Render the change between two prices, compared in whole paise"""
+    if old_price is None or new_price is None:
+        return ""
     
-    # Common URL patterns
-    url_pattern = r'https?://(?:www\.)?[-a-zA-Z0-9@:%._\+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b(?:[-a-zA-Z0-9()@:%_\+.~#?&/=]*)'
+    # Rounding to paise keeps float noise from showing up as a change
+    old_paise = round(old_price * 100)
+    new_paise = round(new_price * 100)
+    if not old_paise or new_paise == old_paise:
+        return ""
     
-    urls = re.findall(url_pattern, text)
-    return urls[0] if urls else text.strip()
+    diff = (new_paise - old_paise) * 100 / old_paise
+    return f" 📉 {diff:.1f}%" if diff < 0 else f" 📈 +{diff:.1f}%"
+
+
+def extract_url_from_message(text: str) -> str:
+    """Extract URL from message text"""
+    match = _URL_RE.search(text)
+    return match.group(0) if match else text.strip()
 
 
 @router.message(Command("track"))
@@ -118,21 +156,21 @@ async def process_product_url(message: Message, state: FSMContext):
             })
         
         # Check tracking limit (premium users get more)
-        user_trackings = await db_manager.get_user_trackings(message.from_user.id)
+        tracking_count = await db_manager.count_user_trackings(message.from_user.id)
         max_trackings = 50 if user.is_premium else 10
         
-        if len(user_trackings) >= max_trackings:
+        if tracking_count >= max_trackings:
             await processing_msg.edit_text(
                 f"⚠️ **Tracking Limit Reached**\n\n"
                 f"You can track up to {max_trackings} products.\n"
-                f"Current: {len(user_trackings)}\n\n"
+                f"Current: {tracking_count}\n\n"
                 "Stop tracking some products or upgrade to Premium for more!",
                 parse_mode="Markdown"
             )
             await state.clear()
             return
         
-        # Create tracking entry
+        # Create tracking entry; add_tracking stamps the timestamps
         tracking_data = {
             "user_id": message.from_user.id,
             "product_url": url,
@@ -148,13 +186,22 @@ async def process_product_url(message: Message, state: FSMContext):
             "price_history": [{
                 "price": product_data.get('price'),
                 "currency": product_data.get('currency', 'INR'),
-                "timestamp": datetime.utcnow(),
                 "stock_status": product_data.get('stock_status', 'in_stock'),
                 "discount": product_data.get('discount')
             }]
         }
         
-        tracking = await db_manager.add_tracking(tracking_data)
+        try:
+            tracking = await db_manager.add_tracking(tracking_data)
+        except DuplicateKeyError:
+            await processing_msg.edit_text(
+                "ℹ️ **Already Tracking**\n\n"
+                "You're already tracking this product.\n"
+                "Use /my_trackings to see it.",
+                parse_mode="Markdown"
+            )
+            await state.clear()
+            return
         
         # Success message with affiliate link
         discount_text = f"\n💰 Discount: {product_data.get('discount', 0)}%" if product_data.get('discount') else ""
@@ -189,7 +236,7 @@ async def process_product_url(message: Message, state: FSMContext):
 async def cmd_my_trackings(message: Message):
     """Show user's tracked products"""
     try:
-        trackings = await db_manager.get_user_trackings(message.from_user.id)
+        trackings = await db_manager.get_user_trackings_raw(message.from_user.id)
         
         if not trackings:
             await message.answer(
@@ -200,45 +247,28 @@ async def cmd_my_trackings(message: Message):
             )
             return
         
-        response = f"📊 **Your Tracked Products** ({len(trackings)})\n\n"
+        # HTML only needs the product fields escaped; Markdown broke on
+        # product names containing _, * or [
+        response = f"📊 <b>Your Tracked Products</b> ({len(trackings)})\n\n"
         
         for i, tracking in enumerate(trackings, 1):
-            status_emoji = "⏸️" if tracking.is_paused else "✅"
-            platform_emoji = {
-                "amazon": "📦",
-                "flipkart": "🛒",
-                "myntra": "👗",
-                "meesho": "🛍️",
-                "snapdeal": "🎁",
-                "ebay": "🏪"
-            }.get(tracking.platform, "🔗")
-            
-            price_change = ""
-            if tracking.price_history and len(tracking.price_history) > 1:
-                old_price = tracking.price_history[0].price
-                new_price = tracking.current_price
-                if new_price < old_price:
-                    diff = ((old_price - new_price) / old_price) * 100
-                    price_change = f" 📉 -{diff:.1f}%"
-                elif new_price > old_price:
-                    diff = ((new_price - old_price) / old_price) * 100
-                    price_change = f" 📈 +{diff:.1f}%"
+            status_emoji = "⏸️" if tracking["is_paused"] else "✅"
+            platform_emoji = PLATFORM_EMOJIS.get(tracking["platform"], "🔗")
+            price_change = format_price_change(tracking.get("first_price"), tracking["current_price"])
             
             response += (
-                f"{status_emoji} **{i}. {tracking.product_name[:50]}**\n"
-                f"{platform_emoji} {tracking.platform.title()} | "
-                f"💵 ₹{tracking.current_price}{price_change}\n"
-                f"🔗 [View Product]({tracking.affiliate_url})\n"
-                f"🆔 ID: `{str(tracking.id)}`\n\n"
+                f"{status_emoji} <b>{i}. {escape(tracking['product_name'][:50])}</b>\n"
+                f"{platform_emoji} {tracking['platform'].title()} | "
+                f"💵 ₹{tracking['current_price']}{price_change}\n"
+                f"🔗 <a href=\"{escape(tracking['affiliate_url'])}\">View Product</a>\n"
+                f"🆔 ID: <code>{tracking['_id']}</code>\n\n"
             )
         
-        response += "💡 Use /product <id> for details\n"
-        response += "⏸️ Use /pause <id> to pause tracking\n"
-        response += "🛑 Use /stop <id> to stop tracking"
+        response += MY_TRACKINGS_FOOTER
         
         await message.answer(
             response,
-            parse_mode="Markdown",
+            parse_mode="HTML",
             disable_web_page_preview=True
         )
         
@@ -266,9 +296,10 @@ async def cmd_product_details(message: Message):
             return
         
         tracking_id = parts[1].strip()
-        tracking = await db_manager.get_tracking_by_id(tracking_id)
+        # Price stats are stored on the tracking, so its embedded history isn't fetched
+        tracking = await db_manager.get_tracking_summary(tracking_id, message.from_user.id)
         
-        if not tracking or tracking.user_id != message.from_user.id:
+        if not tracking:
             await message.answer(
                 "❌ **Product Not Found**\n\n"
                 "This tracking ID doesn't exist or doesn't belong to you.",
@@ -276,45 +307,54 @@ async def cmd_product_details(message: Message):
             )
             return
         
-        # Calculate statistics
-        price_history = tracking.price_history
-        lowest_price = min([p.price for p in price_history]) if price_history else tracking.current_price
-        highest_price = max([p.price for p in price_history]) if price_history else tracking.current_price
+        current_price = tracking.get('current_price')
+        lowest_price = tracking.get('lowest_price')
+        highest_price = tracking.get('highest_price')
+        if lowest_price is None:
+            lowest_price = highest_price = current_price
         
         price_change = 0
-        if len(price_history) > 1:
-            original = price_history[0].price
-            current = tracking.current_price
-            price_change = ((current - original) / original) * 100
+        original = tracking.get('first_price')
+        if original and current_price is not None:
+            price_change = ((current_price - original) / original) * 100
         
-        status = "✅ Active" if tracking.is_active and not tracking.is_paused else "⏸️ Paused" if tracking.is_paused else "🛑 Stopped"
+        is_active = tracking.get('is_active', True)
+        is_paused = tracking.get('is_paused', False)
+        status = "✅ Active" if is_active and not is_paused else "⏸️ Paused" if is_paused else "🛑 Stopped"
         
         response = (
-            f"📦 **Product Details**\n\n"
-            f"**Name:** {tracking.product_name}\n"
-            f"**Platform:** {tracking.platform.title()}\n"
-            f"**Status:** {status}\n\n"
-            f"💵 **Current Price:** ₹{tracking.current_price}\n"
-            f"📊 **Original Price:** ₹{tracking.original_price}\n"
-            f"📉 **Lowest Price:** ₹{lowest_price}\n"
-            f"📈 **Highest Price:** ₹{highest_price}\n"
-            f"📊 **Price Change:** {price_change:+.2f}%\n\n"
-            f"📅 **Tracked Since:** {tracking.created_at.strftime('%d %b %Y')}\n"
-            f"🔍 **Checks:** {tracking.check_count}\n"
-            f"🔔 **Alerts Sent:** {tracking.alert_count}\n\n"
-            f"🔗 [View Product]({tracking.affiliate_url})\n\n"
-            f"🆔 **ID:** `{str(tracking.id)}`"
+            f"📦 <b>Product Details</b>\n\n"
+            f"<b>Name:</b> {escape(str(tracking.get('product_name')))}\n"
+            f"<b>Platform:</b> {tracking['platform'].title()}\n"
+            f"<b>Status:</b> {status}\n\n"
+            f"💵 <b>Current Price:</b> ₹{current_price}\n"
+            f"📊 <b>Original Price:</b> ₹{tracking.get('original_price')}\n"
+            f"📉 <b>Lowest Price:</b> ₹{lowest_price}\n"
+            f"📈 <b>Highest Price:</b> ₹{highest_price}\n"
+            f"📊 <b>Price Change:</b> {price_change:+.2f}%\n\n"
+            f"📅 <b>Tracked Since:</b> {tracking['created_at'].strftime('%d %b %Y')}\n"
+            f"🔍 <b>Checks:</b> {tracking.get('check_count', 0)}\n"
+            f"🔔 <b>Alerts Sent:</b> {tracking.get('alert_count', 0)}\n\n"
+            f"🔗 <a href=\"{escape(tracking['affiliate_url'])}\">View Product</a>\n\n"
+            f"🆔 <b>ID:</b> <code>{escape(tracking_id)}</code>"
         )
         
-        if tracking.notes:
-            response += f"\n\n📝 **Notes:** {tracking.notes}"
+        if tracking.get('notes'):
+            response += f"\n\n📝 <b>Notes:</b> {escape(tracking['notes'])}"
         
-        if tracking.tags:
-            response += f"\n🏷️ **Tags:** {', '.join(tracking.tags)}"
+        if tracking.get('tags'):
+            response += f"\n🏷️ <b>Tags:</b> {escape(', '.join(tracking['tags']))}"
+        
+        history = await db_manager.get_price_history(tracking_id, limit=PRODUCT_HISTORY_ENTRIES)
+        if history:
+            response += "\n\n🕒 <b>Recent Prices:</b>\n" + "\n".join(
+                f"{entry.timestamp.strftime('%d %b %H:%M')}: ₹{entry.price}"
+                for entry in history
+            )
         
         await message.answer(
             response,
-            parse_mode="Markdown",
+            parse_mode="HTML",
             disable_web_page_preview=True,
             reply_markup=get_product_actions_keyboard(tracking_id)
         )
@@ -1,67 +1,108 @@
 """
 Inline keyboards for bot interactions
 """
+from functools import lru_cache
+from typing import Optional, Tuple
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
-def get_tracking_keyboard(tracking_id: str) -> InlineKeyboardMarkup:
-    """Get keyboard for tracking management"""
+# Per-tracking keyboards depend only on the tracking ID, so their button
+# specs are cached. Markups are mutable, so each call builds its own from
+# the spec rather than handing out a shared instance.
+KEYBOARD_CACHE_SIZE = 1024
+
+# Rows of (text, field, value) buttons, field being e.g. "callback_data"
+KeyboardSpec = Tuple[Tuple[Tuple[str, str, str], ...], ...]
+
+
+def _build_keyboard(spec: KeyboardSpec) -> InlineKeyboardMarkup:
+    """Build a fresh markup from a button spec"""
     return InlineKeyboardMarkup(inline_keyboard=[
-        [
-            InlineKeyboardButton(
-                text="📊 Details",
-                callback_data=f"details:{tracking_id}"
-            )
-        ],
-        [
-            InlineKeyboardButton(
-                text="⏸️ Pause",
-                callback_data=f"pause:{tracking_id}"
-            ),
-            InlineKeyboardButton(
-                text="🛑 Stop",
-                callback_data=f"stop:{tracking_id}"
-            )
-        ]
+        [InlineKeyboardButton(text=text, **{field: value}) for text, field, value in row]
+        for row in spec
     ])
 
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def _tracking_keyboard_spec(tracking_id: str) -> KeyboardSpec:
+    return (
+        (("📊 Details", "callback_data", f"details:{tracking_id}"),),
+        (
+            ("⏸️ Pause", "callback_data", f"pause:{tracking_id}"),
+            ("🛑 Stop", "callback_data", f"stop:{tracking_id}")
+        )
+    )
+
+
+def get_tracking_keyboard(tracking_id: str) -> InlineKeyboardMarkup:
+    """Get keyboard for tracking management"""
+    return _build_keyboard(_tracking_keyboard_spec(tracking_id))
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def _price_alert_keyboard_spec(tracking_id: str, affiliate_url: str) -> KeyboardSpec:
+    return (
+        (("🛒 View Product", "url", affiliate_url),),
+        (
+            ("📊 Details", "callback_data", f"product_details:{tracking_id}"),
+            ("⏸️ Pause", "callback_data", f"pause_tracking:{tracking_id}")
+        ),
+        (("🛑 Stop Tracking", "callback_data", f"stop_tracking:{tracking_id}"),)
+    )
+
+
+def get_price_alert_keyboard(tracking_id: str, affiliate_url: str) -> InlineKeyboardMarkup:
+    """Get keyboard sent with a price alert"""
+    return _build_keyboard(_price_alert_keyboard_spec(tracking_id, affiliate_url))
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def _product_actions_keyboard_spec(tracking_id: str) -> KeyboardSpec:
+    return (
+        (("📊 View Details", "callback_data", f"product_details:{tracking_id}"),),
+        (
+            ("⏸️ Pause", "callback_data", f"pause_tracking:{tracking_id}"),
+            ("🛑 Stop", "callback_data", f"stop_tracking:{tracking_id}")
+        )
+    )
+
+
 def get_product_actions_keyboard(tracking_id: str) -> InlineKeyboardMarkup:
     """Get keyboard for product actions"""
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [
-            InlineKeyboardButton(
-                text="📊 View Details",
-                callback_data=f"product_details:{tracking_id}"
-            )
-        ],
-        [
-            InlineKeyboardButton(
-                text="⏸️ Pause",
-                callback_data=f"pause_tracking:{tracking_id}"
-            ),
-            InlineKeyboardButton(
-                text="🛑 Stop",
-                callback_data=f"stop_tracking:{tracking_id}"
-            )
-        ]
-    ])
+    return _build_keyboard(_product_actions_keyboard_spec(tracking_id))
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def _alert_settings_keyboard_spec(tracking_id: str) -> KeyboardSpec:
+    return (
+        (("🔔 Any Change", "callback_data", f"alert_any:{tracking_id}"),),
+        (
+            ("📉 % Drop", "callback_data", f"alert_percent:{tracking_id}"),
+            ("💰 Fixed Price", "callback_data", f"alert_fixed:{tracking_id}")
+        )
+    )
+
 
 def get_alert_settings_keyboard(tracking_id: str) -> InlineKeyboardMarkup:
     """Get keyboard for alert settings"""
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [
+    return _build_keyboard(_alert_settings_keyboard_spec(tracking_id))
+
+
+def get_pagination_keyboard(prefix: str, page: int, has_next: bool) -> Optional[InlineKeyboardMarkup]:
+    """Get prev/next keyboard for paginated lists"""
+    buttons = []
+    if page > 0:
+        buttons.append(
             InlineKeyboardButton(
-                text="🔔 Any Change",
-                callback_data=f"alert_any:{tracking_id}"
+                text="⬅️ Prev",
+                callback_data=f"{prefix}:{page - 1}"
             )
-        ],
-        [
+        )
+    if has_next:
+        buttons.append(
             InlineKeyboardButton(
-                text="📉 % Drop",
-                callback_data=f"alert_percent:{tracking_id}"
-            ),
-            InlineKeyboardButton(
-                text="💰 Fixed Price",
-                callback_data=f"alert_fixed:{tracking_id}"
+                text="Next ➡️",
+                callback_data=f"{prefix}:{page + 1}"
             )
-        ]
-    ])
+        )
+    
+    return InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
@@ -2,11 +2,14 @@
 Price Tracker Bot - Main Entry Point
 With Affiliate Link Integration
 """
-import os
 import sys
+import atexit
+import queue
 import asyncio
 import logging
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
 from aiogram import Bot, Dispatcher
@@ -19,17 +22,25 @@ from apscheduler.triggers.cron import CronTrigger
 # Load environment variables
 load_dotenv()
 
+from config.settings import CONFIG
+
 # Configure logging (Docker-friendly)
-log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
+log_level = CONFIG.log_level
 log_handlers = [logging.StreamHandler(sys.stdout)]
 
 # Try to add file handler if possible
 try:
-    log_file = os.getenv('LOG_FILE', '/tmp/bot.log')
-    log_handlers.append(logging.FileHandler(log_file))
+    file_handler = logging.FileHandler(CONFIG.log_file)
 except PermissionError:
     # If file logging fails, just use console logging
     pass
+else:
+    # File writes happen on the listener's thread, off the event loop
+    log_queue = queue.SimpleQueue()
+    log_listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    log_listener.start()
+    atexit.register(log_listener.stop)
+    log_handlers.append(QueueHandler(log_queue))
 
 logging.basicConfig(
     level=getattr(logging, log_level, logging.INFO),
@@ -42,7 +53,9 @@ logger = logging.getLogger(__name__)
 from database.db_manager import db_manager
 from utils.affiliate_manager import affiliate_manager
 from config.affiliate_config import AFFILIATE_CONFIG
-from notifications.notifier import Notifier
+from notifications.notifier import Notification, Notifier, PriceAlert, StockAlert
+from scrapers.scraper_manager import scraper_manager
+from database.models import AlertSettings, ProductTracking
 
 # Import handlers
 from handlers import tracking_handler, admin_handler, user_handler
@@ -54,7 +67,7 @@ class PriceTrackerBot:
     """
     
     def __init__(self):
-        self.bot_token = os.getenv("BOT_TOKEN")
+        self.bot_token = CONFIG.bot_token
         if not self.bot_token:
             raise ValueError("BOT_TOKEN not found in environment variables")
         
@@ -63,7 +76,13 @@ class PriceTrackerBot:
             default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN)
         )
         self.dp = Dispatcher()
-        self.scheduler = AsyncIOScheduler()
+        # A run that overruns its slot is never stacked or replayed in a
+        # burst; late cron jobs still run within the hour
+        self.scheduler = AsyncIOScheduler(job_defaults={
+            'coalesce': True,
+            'max_instances': 1,
+            'misfire_grace_time': 3600
+        })
         self.notifier = None
         
         # Load affiliate config into affiliate manager
@@ -91,32 +110,44 @@ class PriceTrackerBot:
             
             # Initialize notifier
             self.notifier = Notifier(self.bot)
+            # Available to handlers as the `notifier` argument
+            self.dp["notifier"] = self.notifier
             
             # Register handlers
-            self.dp.include_router(tracking_handler.router)
-            self.dp.include_router(admin_handler.router)
-            self.dp.include_router(user_handler.router)
+            self.dp.include_routers(
+                tracking_handler.router,
+                admin_handler.router,
+                user_handler.router
+            )
             logger.info("✅ Handlers registered")
             
+            # One scraper session, and its connection pool, for the whole run,
+            # with every platform host resolved and connected up front
+            await scraper_manager.prewarm()
+            
             # Start scheduler
             self._setup_scheduled_jobs()
             self.scheduler.start()
             logger.info("✅ Scheduler started")
             
-            # Send startup notification to admins
-            admin_ids = os.getenv("ADMIN_USER_IDS", "").split(",")
-            for admin_id in admin_ids:
-                if admin_id.strip():
-                    try:
-                        await self.bot.send_message(
-                            chat_id=int(admin_id.strip()),
-                            text="✅ **Bot Started Successfully**\n\n"
-                                 "🔗 Affiliate links enabled\n"
-                                 "📊 All systems operational",
-                            parse_mode="Markdown"
-                        )
-                    except Exception as e:
-                        logger.error(f"Failed to notify admin {admin_id}: {e}")
+            # Send startup notification to admins, all at once
+            async def _notify_admin(admin_id: int):
+                try:
+                    await self.bot.send_message(
+                        chat_id=admin_id,
+                        text="✅ **Bot Started Successfully**\n\n"
+                             "🔗 Affiliate links enabled\n"
+                             "📊 All systems operational",
+                        parse_mode="Markdown"
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to notify admin {admin_id}: {e}")
+            
+            await asyncio.gather(*[
+                _notify_admin(admin_id)
+                for admin_id in CONFIG.admin_user_ids
+                if admin_id
+            ])
             
             logger.info("✅ Bot is ready and running!")
             
@@ -126,8 +157,8 @@ class PriceTrackerBot:
     
     def _setup_scheduled_jobs(self):
         """Setup scheduled jobs for price checking"""
-        check_interval = int(os.getenv("CHECK_INTERVAL", 3600))
-        batch_size = int(os.getenv("BATCH_SIZE", 100))
+        check_interval = CONFIG.check_interval
+        batch_size = CONFIG.batch_size
         
         # Price checking job
         self.scheduler.add_job(
@@ -136,7 +167,10 @@ class PriceTrackerBot:
             id='price_checker',
             name='Check product prices',
             replace_existing=True,
-            kwargs={'batch_size': batch_size}
+            kwargs={'batch_size': batch_size},
+            misfire_grace_time=max(check_interval // 2, 1),
+            # First check right away instead of one interval after startup
+            next_run_time=datetime.now()
         )
         
         # Daily summary job (9 AM)
@@ -189,80 +223,23 @@ class PriceTrackerBot:
                 logger.info("No products to check")
                 return
             
-            from scrapers.scraper_manager import scraper_manager
+            # One timestamp for the whole batch's updates
+            checked_at = datetime.utcnow()
             
+            # Scrapes overlap up to the concurrency limit; the scraper spaces
+            # out requests per platform and scrapes a URL tracked by several
+            # users once. The batch's price updates are written together
+            # when the block ends.
             notifications = []
-            
-            for tracking in trackings:
-                try:
-                    # Scrape current price
-                    product_data = await scraper_manager.scrape_product(
-                        tracking.product_url,
-                        tracking.platform
-                    )
-                    
-                    if not product_data or 'error' in product_data:
-                        logger.warning(f"Failed to scrape {tracking.product_id}")
-                        continue
-                    
-                    new_price = product_data.get('price')
-                    old_price = tracking.current_price
-                    
-                    # Update tracking
-                    await db_manager.update_tracking_price(
-                        str(tracking.id),
-                        new_price,
-                        product_data.get('stock_status', 'in_stock'),
-                        product_data.get('discount')
+            async with db_manager.price_updates.batch(), scraper_manager.batch():
+                scraped = await scraper_manager.scrape_many(
+                    [(tracking.product_url, tracking.platform) for tracking in trackings],
+                    concurrency=CONFIG.scrape_concurrency
+                )
+                for tracking, product_data in zip(trackings, scraped):
+                    notifications.extend(
+                        await self._check_tracking(tracking, product_data, checked_at)
                     )
-                    
-                    # Check if alert should be sent
-                    if old_price and new_price != old_price:
-                        change_percent = ((new_price - old_price) / old_price) * 100
-                        
-                        # Check alert settings
-                        should_alert = False
-                        alert_settings = tracking.alert_settings
-                        
-                        if alert_settings.alert_type == 'any_change':
-                            should_alert = True
-                        elif alert_settings.alert_type == 'percentage_drop':
-                            if change_percent <= -alert_settings.threshold:
-                                should_alert = True
-                        elif alert_settings.alert_type == 'fixed_price':
-                            if new_price <= alert_settings.threshold:
-                                should_alert = True
-                        
-                        # Check price increase notification setting
-                        if change_percent > 0 and not alert_settings.notify_on_price_increase:
-                            should_alert = False
-                        
-                        if should_alert:
-                            notifications.append({
-                                'type': 'price_alert',
-                                'user_id': tracking.user_id,
-                                'tracking': tracking,
-                                'old_price': old_price,
-                                'new_price': new_price,
-                                'change_percent': change_percent
-                            })
-                    
-                    # Check stock status changes
-                    if product_data.get('stock_status') != 'in_stock' and \
-                       tracking.alert_settings.notify_on_stock:
-                        notifications.append({
-                            'type': 'stock_alert',
-                            'user_id': tracking.user_id,
-                            'tracking': tracking,
-                            'stock_status': product_data.get('stock_status')
-                        })
-                    
-                    # Small delay to avoid rate limiting
-                    await asyncio.sleep(0.5)
-                    
-                except Exception as e:
-                    logger.error(f"Error checking product {tracking.id}: {e}")
-                    continue
             
             # Send notifications in batch
             if notifications:
@@ -274,25 +251,115 @@ class PriceTrackerBot:
         except Exception as e:
             logger.error(f"Error in price check: {e}", exc_info=True)
     
+    @staticmethod
+    def _should_alert(alert_settings: AlertSettings, new_price: float, change_percent: float) -> bool:
+        """Decide from the tracking's alert settings whether a price change is reported"""
+        # Price increase notification setting overrides the alert type
+        if change_percent > 0 and not alert_settings.notify_on_price_increase:
+            return False
+        
+        alert_type = alert_settings.alert_type
+        if alert_type == 'any_change':
+            return True
+        
+        # Threshold alerts without a threshold never fire
+        threshold = alert_settings.threshold
+        if threshold is None:
+            return False
+        if alert_type == 'percentage_drop':
+            return change_percent <= -threshold
+        if alert_type == 'fixed_price':
+            return new_price <= threshold
+        return False
+    
+    async def _check_tracking(
+        self,
+        tracking: ProductTracking,
+        product_data: Optional[Dict],
+        checked_at: datetime
+    ) -> List[Notification]:
+        """Queue one tracking's price update from its scrape and return its notifications"""
+        notifications = []
+        
+        try:
+            if not product_data or 'error' in product_data:
+                logger.warning(f"Failed to scrape {tracking.product_id}")
+                return notifications
+            
+            new_price = product_data.get('price')
+            old_price = tracking.current_price
+            
+            # Update tracking (written in bulk)
+            await db_manager.price_updates.add(
+                str(tracking.id),
+                new_price,
+                product_data.get('stock_status', 'in_stock'),
+                product_data.get('discount'),
+                checked_at
+            )
+            
+            # Check if alert should be sent
+            if old_price and new_price != old_price:
+                change_percent = ((new_price - old_price) / old_price) * 100
+                
+                if self._should_alert(tracking.alert_settings, new_price, change_percent):
+                    notifications.append(PriceAlert(
+                        user_id=tracking.user_id,
+                        tracking=tracking,
+                        old_price=old_price,
+                        new_price=new_price,
+                        change_percent=change_percent
+                    ))
+            
+            # Check stock status changes
+            if product_data.get('stock_status') != 'in_stock' and \
+               tracking.alert_settings.notify_on_stock:
+                notifications.append(StockAlert(
+                    user_id=tracking.user_id,
+                    tracking=tracking,
+                    stock_status=product_data.get('stock_status')
+                ))
+            
+        except Exception as e:
+            logger.error(f"Error checking product {tracking.id}: {e}")
+        
+        return notifications
+    
     async def send_daily_summaries(self):
         """Send daily summaries to users"""
         try:
             logger.info("📊 Sending daily summaries")
             
-            # Get users who want daily summaries
-            users = await db_manager.db.users.find({
-                "is_active": True,
-                "daily_summary": True
-            }).to_list(length=None)
+            # Stream users who want daily summaries
+            cursor = db_manager.db.users.find(
+                {"is_active": True, "daily_summary": True},
+                {"user_id": 1}
+            ).batch_size(500)
             
-            for user in users:
+            async def _send(user_id: int):
                 try:
-                    await self.notifier.send_daily_summary(user['user_id'])
-                    await asyncio.sleep(0.1)
+                    await self.notifier.send_daily_summary(user_id)
                 except Exception as e:
-                    logger.error(f"Failed to send summary to {user['user_id']}: {e}")
+                    logger.error(f"Failed to send summary to {user_id}: {e}")
+            
+            # Concurrent waves of the notifier's batch size, one wave per
+            # second, to stay within Telegram's broadcast limit
+            wave_size = self.notifier.batch_size
+            wave = []
+            sent = 0
+            async for user in cursor:
+                wave.append(user['user_id'])
+                if len(wave) >= wave_size:
+                    await asyncio.gather(*[_send(user_id) for user_id in wave])
+                    sent += len(wave)
+                    wave = []
+                    await asyncio.sleep(1)
             
-            logger.info(f"✅ Daily summaries sent to {len(users)} users")
+            if wave:
+                await asyncio.gather(*[_send(user_id) for user_id in wave])
+                sent += len(wave)
+            
+            logger.info(f"✅ Daily summaries sent to {sent} users")
             
         except Exception as e:
             logger.error(f"Error sending daily summaries: {e}")
@@ -302,13 +369,13 @@ class PriceTrackerBot:
         try:
             logger.info("📊 Sending weekly summaries")
             
-            users = await db_manager.db.users.find({
+            user_count = await db_manager.db.users.count_documents({
                 "is_active": True,
                 "weekly_summary": True
-            }).to_list(length=None)
+            })
             
             # Implementation similar to daily summaries
-            logger.info(f"✅ Weekly summaries sent to {len(users)} users")
+            logger.info(f"✅ Weekly summaries sent to {user_count} users")
             
         except Exception as e:
             logger.error(f"Error sending weekly summaries: {e}")
@@ -317,8 +384,7 @@ class PriceTrackerBot:
         """Cleanup old inactive data"""
         try:
             logger.info("🧹 Running cleanup job")
-            cleanup_days = int(os.getenv("AUTO_CLEANUP_DAYS", 90))
-            await db_manager.cleanup_old_data(days=cleanup_days)
+            await db_manager.cleanup_old_data(days=CONFIG.cleanup_days)
             logger.info("✅ Cleanup completed")
         except Exception as e:
             logger.error(f"Error in cleanup: {e}")
@@ -344,7 +410,12 @@ class PriceTrackerBot:
             logger.info("🛑 Shutting down bot...")
             
             self.scheduler.shutdown()
+            if self.notifier:
+                await self.notifier.close()
+            await db_manager.price_updates.flush()
+            await db_manager.alert_stats.flush()
             await db_manager.disconnect()
+            await scraper_manager.close_session()
             await self.bot.session.close()
             
             logger.info("✅ Bot shutdown complete")
@@ -374,6 +445,13 @@ async def main():
 
 
 if __name__ == "__main__":
+    # uvloop is a faster drop-in event loop; it isn't available on Windows
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+    
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
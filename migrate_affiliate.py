@@ -4,12 +4,15 @@ Migration script to add affiliate URLs to existing trackings
 import asyncio
 import logging
 from datetime import datetime
+from pymongo import UpdateOne
 from database.db_manager import db_manager
 from utils.affiliate_manager import affiliate_manager
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+MIGRATION_BATCH_SIZE = 1000
+
 async def migrate_trackings():
     """Migrate existing trackings to include affiliate URLs"""
     try:
@@ -20,14 +23,13 @@ async def migrate_trackings():
         logger.info("✅ Database connected")
         
         # Find trackings without affiliate_url
-        trackings = await db_manager.db.trackings.find({
+        query = {
             "$or": [
                 {"affiliate_url": {"$exists": False}},
                 {"original_url": {"$exists": False}}
             ]
-        }).to_list(length=None)
-        
-        total = len(trackings)
+        }
+        total = await db_manager.db.trackings.count_documents(query)
         logger.info(f"📊 Found {total} trackings to migrate")
         
         if total == 0:
@@ -36,8 +38,28 @@ async def migrate_trackings():
         
         success = 0
         failed = 0
+        processed = 0
+        operations = []
         
-        for i, tracking in enumerate(trackings, 1):
+        async def flush():
+            nonlocal success, failed
+            try:
+                await db_manager.db.trackings.bulk_write(operations, ordered=False)
+                success += len(operations)
+            except Exception as e:
+                logger.error(f"❌ Error writing batch of {len(operations)} trackings: {e}")
+                failed += len(operations)
+            operations.clear()
+            logger.info(f"✅ [{processed}/{total}] Migrated")
+        
+        # Stream the matches and write them in batches
+        cursor = db_manager.db.trackings.find(
+            query,
+            {"product_url": 1, "platform": 1}
+        ).batch_size(MIGRATION_BATCH_SIZE)
+        
+        async for tracking in cursor:
+            processed += 1
             try:
                 product_url = tracking.get('product_url')
                 platform = tracking.get('platform')
@@ -47,36 +69,35 @@ async def migrate_trackings():
                     failed += 1
                     continue
                 
+                # One timestamp per written batch
+                if not operations:
+                    now = datetime.utcnow()
+                
                 # Generate affiliate URL
-                affiliate_url = affiliate_manager.convert_to_affiliate(
-                    product_url,
-                    platform
-                )
+                affiliate_url = affiliate_manager.convert_to_affiliate(product_url, platform)
                 
-                # Update database
-                await db_manager.db.trackings.update_one(
+                operations.append(UpdateOne(
                     {"_id": tracking['_id']},
                     {
                         "$set": {
                             "original_url": product_url,
                             "affiliate_url": affiliate_url,
-                            "updated_at": datetime.utcnow()
+                            "updated_at": now
                         }
                     }
-                )
-                
-                success += 1
-                logger.info(f"✅ [{i}/{total}] Migrated: {tracking.get('product_name', 'Unknown')[:50]}")
+                ))
                 
-                # Small delay to avoid overwhelming the database
-                if i % 100 == 0:
-                    await asyncio.sleep(0.5)
+                if len(operations) >= MIGRATION_BATCH_SIZE:
+                    await flush()
                 
             except Exception as e:
                 logger.error(f"❌ Error migrating tracking {tracking['_id']}: {e}")
                 failed += 1
                 continue
         
+        if operations:
+            await flush()
+        
         logger.info("=" * 60)
         logger.info(f"✅ Migration Complete!")
         logger.info(f"📊 Total: {total}")
@@ -2,16 +2,72 @@
 Notification System with Affiliate Links
 Sends alerts to users when price changes occur
 """
+import asyncio
 import logging
-from typing import List, Dict, Optional
+from collections import defaultdict
+from functools import lru_cache
+from typing import List, Dict, NamedTuple, Optional, Union
 from datetime import datetime
 from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from config.settings import CONFIG
 from database.db_manager import db_manager
 from database.models import ProductTracking
+from keyboards.inline_keyboards import get_price_alert_keyboard
+from notifications.rate_limiter import AIMDController, RateLimiter
 
 logger = logging.getLogger(__name__)
 
+# Telegram's limit, counted in UTF-16 code units
+MAX_MESSAGE_LENGTH = 4096
+
+# Characters with a meaning in Telegram's (legacy) Markdown
+_MARKDOWN_SPECIAL = str.maketrans({c: f"\\{c}" for c in "_*`["})
+
+
+@lru_cache(maxsize=10000)
+def escape_markdown(text: Optional[str]) -> str:
+    """Escape a user-supplied value for a Markdown message, cached per value"""
+    return (text or "").translate(_MARKDOWN_SPECIAL)
+
+
+# Broadcast text is rendered once per announcement, not per recipient
+ANNOUNCEMENT_TEMPLATE = "📢 **Admin Announcement**\n\n{message}"
+
+
+def render_announcement(message: str) -> str:
+    """Render an announcement, with the admin's text sent as written"""
+    return ANNOUNCEMENT_TEMPLATE.format(message=escape_markdown(message))
+
+# Pending notifications before enqueue() waits for the workers
+MAX_QUEUED_NOTIFICATIONS = 10000
+
+
+class PriceAlert(NamedTuple):
+    """A price change worth telling the user about"""
+    user_id: int
+    tracking: ProductTracking
+    old_price: float
+    new_price: float
+    change_percent: float
+
+
+class StockAlert(NamedTuple):
+    """A change in a product's stock status"""
+    user_id: int
+    tracking: ProductTracking
+    stock_status: str
+
+
+class PriceDigest(NamedTuple):
+    """Several of one user's price alerts sent as a single message"""
+    user_id: int
+    alerts: List[PriceAlert]
+
+
+Notification = Union[PriceAlert, StockAlert, PriceDigest]
+
 
 class Notifier:
     """
@@ -20,8 +76,29 @@ class Notifier:
     
     def __init__(self, bot: Bot):
         self.bot = bot
-        self.batch_size = 30  # Telegram limit
-        self.notification_queue = []
+        self.batch_size = CONFIG.notification_batch_size  # Telegram limit
+        # Shared by every send, so all broadcasts stay under one limit
+        self.rate_limiter = RateLimiter()
+        # Created on first use so they bind to the running event loop
+        self.notification_queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+    
+    async def _send_message(self, chat_id: int, text: str, **kwargs):
+        """
+        Send a message through the rate limiter, waiting out flood control once
+        
+        On a 429 Telegram says how long to back off; the whole limiter is
+        paused for that long so other sends don't pile onto the limit,
+        then the message is retried.
+        """
+        await self.rate_limiter.acquire(chat_id)
+        try:
+            return await self.bot.send_message(chat_id=chat_id, text=text, **kwargs)
+        except TelegramRetryAfter as e:
+            logger.warning(f"Flood control for {chat_id}, retrying in {e.retry_after}s")
+            self.rate_limiter.pause(e.retry_after)
+            await self.rate_limiter.acquire(chat_id)
+            return await self.bot.send_message(chat_id=chat_id, text=text, **kwargs)
     
     async def send_price_alert(
         self,
@@ -45,7 +122,7 @@ class Notifier:
             
             message = (
                 f"{emoji} **Price Alert!**\n\n"
-                f"📦 **{tracking.product_name}**\n"
+                f"📦 **{escape_markdown(tracking.product_name)}**\n"
                 f"🏪 Platform: {tracking.platform.title()}\n\n"
                 f"💵 Old Price: ₹{old_price}\n"
                 f"💵 New Price: ₹{new_price}\n"
@@ -54,33 +131,62 @@ class Notifier:
                 f"⏰ {datetime.now().strftime('%d %b %Y, %I:%M %p')}"
             )
             
-            # Create inline keyboard
+            # Built once per tracking and reused for its later alerts
+            keyboard = get_price_alert_keyboard(str(tracking.id), tracking.affiliate_url)
+            
+            await self._send_message(
+                chat_id=user_id,
+                text=message,
+                parse_mode="Markdown",
+                disable_web_page_preview=True,
+                reply_markup=keyboard
+            )
+            
+            # Update tracking and user stats, written in bulk
+            await db_manager.alert_stats.add(user_id, [str(tracking.id)])
+            
+            logger.info(f"Price alert sent to user {user_id} for product {tracking.id}")
+            
+        except Exception as e:
+            logger.error(f"Error sending price alert to {user_id}: {e}")
+    
+    async def send_price_digest(self, user_id: int, alerts: List[PriceAlert]):
+        """Send several price changes for one user as a single message"""
+        try:
+            sections = []
+            for alert in alerts:
+                tracking = alert.tracking
+                emoji = "📉" if alert.new_price < alert.old_price else "📈"
+                sections.append(
+                    f"{emoji} **{escape_markdown(tracking.product_name)}**\n"
+                    f"💵 ₹{alert.old_price} → ₹{alert.new_price} "
+                    f"({alert.change_percent:+.1f}%)\n"
+                    f"🔗 [Buy Now]({tracking.affiliate_url})"
+                )
+            
+            message = (
+                f"🔔 **Price Alerts** ({len(alerts)} products)\n\n"
+                + "\n\n".join(sections)
+                + f"\n\n⏰ {datetime.now().strftime('%d %b %Y, %I:%M %p')}"
+            )
+            
+            if len(message.encode('utf-16-le')) // 2 > MAX_MESSAGE_LENGTH:
+                # Too long for one message, fall back to one alert each
+                for alert in alerts:
+                    await self.send_price_alert(*alert)
+                return
+            
             keyboard = InlineKeyboardMarkup(inline_keyboard=[
                 [
                     InlineKeyboardButton(
-                        text="🛒 View Product",
-                        url=tracking.affiliate_url
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text="📊 Details",
-                        callback_data=f"product_details:{tracking.id}"
-                    ),
-                    InlineKeyboardButton(
-                        text="⏸️ Pause",
-                        callback_data=f"pause_tracking:{tracking.id}"
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text="🛑 Stop Tracking",
-                        callback_data=f"stop_tracking:{tracking.id}"
+                        text=f"🛒 {(alert.tracking.product_name or 'View Product')[:40]}",
+                        url=alert.tracking.affiliate_url
                     )
                 ]
+                for alert in alerts
             ])
             
-            await self.bot.send_message(
+            await self._send_message(
                 chat_id=user_id,
                 text=message,
                 parse_mode="Markdown",
@@ -88,25 +194,16 @@ class Notifier:
                 reply_markup=keyboard
             )
             
-            # Update tracking stats
-            await db_manager.update_tracking(
-                str(tracking.id),
-                {
-                    "last_alert_sent": datetime.utcnow(),
-                    "alert_count": tracking.alert_count + 1
-                }
-            )
-            
-            # Update user stats
-            await db_manager.db.users.update_one(
-                {"user_id": user_id},
-                {"$inc": {"total_alerts_received": 1}}
+            # Update tracking and user stats, written in bulk
+            await db_manager.alert_stats.add(
+                user_id,
+                [str(alert.tracking.id) for alert in alerts]
             )
             
-            logger.info(f"Price alert sent to user {user_id} for product {tracking.id}")
+            logger.info(f"Price digest of {len(alerts)} alerts sent to user {user_id}")
             
         except Exception as e:
-            logger.error(f"Error sending price alert to {user_id}: {e}")
+            logger.error(f"Error sending price digest to {user_id}: {e}")
     
     async def send_stock_alert(
         self,
@@ -125,7 +222,7 @@ class Notifier:
             
             message = (
                 f"{emoji} **Stock Alert!**\n\n"
-                f"📦 **{tracking.product_name}**\n"
+                f"📦 **{escape_markdown(tracking.product_name)}**\n"
                 f"🏪 Platform: {tracking.platform.title()}\n\n"
                 f"📊 Status: **{status_text}**\n"
                 f"💵 Price: ₹{tracking.current_price}\n\n"
@@ -141,7 +238,7 @@ class Notifier:
                 ]
             ])
             
-            await self.bot.send_message(
+            await self._send_message(
                 chat_id=user_id,
                 text=message,
                 parse_mode="Markdown",
@@ -155,26 +252,10 @@ class Notifier:
     async def send_daily_summary(self, user_id: int):
         """Send daily tracking summary"""
         try:
-            trackings = await db_manager.get_user_trackings(user_id, active_only=True)
-            
-            if not trackings:
-                return
-            
-            # Find products with price changes in last 24 hours
-            price_drops = []
-            price_increases = []
-            
-            for tracking in trackings:
-                if len(tracking.price_history) > 1:
-                    latest = tracking.price_history[-1].price
-                    previous = tracking.price_history[-2].price
-                    
-                    if latest < previous:
-                        change = ((previous - latest) / previous) * 100
-                        price_drops.append((tracking, change))
-                    elif latest > previous:
-                        change = ((latest - previous) / previous) * 100
-                        price_increases.append((tracking, change))
+            # Compared and ranked by the database, only the top five come back
+            changes = await db_manager.get_price_changes(user_id, limit=5)
+            price_drops = changes['drops']
+            price_increases = changes['increases']
             
             if not price_drops and not price_increases:
                 # No changes to report
@@ -184,21 +265,21 @@ class Notifier:
             
             if price_drops:
                 message += "📉 **Price Drops:**\n"
-                for tracking, change in sorted(price_drops, key=lambda x: x[1], reverse=True)[:5]:
-                    message += f"• {tracking.product_name[:40]}\n"
-                    message += f"  💰 ₹{tracking.current_price} (-{change:.1f}%)\n"
-                    message += f"  🔗 [View]({tracking.affiliate_url})\n\n"
+                for tracking in price_drops:
+                    message += f"• {escape_markdown((tracking.get('product_name') or '')[:40])}\n"
+                    message += f"  💰 ₹{tracking.get('current_price')} ({tracking['change_percent']:.1f}%)\n"
+                    message += f"  🔗 [View]({tracking.get('affiliate_url')})\n\n"
             
             if price_increases:
                 message += "📈 **Price Increases:**\n"
-                for tracking, change in sorted(price_increases, key=lambda x: x[1], reverse=True)[:5]:
-                    message += f"• {tracking.product_name[:40]}\n"
-                    message += f"  💰 ₹{tracking.current_price} (+{change:.1f}%)\n\n"
+                for tracking in price_increases:
+                    message += f"• {escape_markdown((tracking.get('product_name') or '')[:40])}\n"
+                    message += f"  💰 ₹{tracking.get('current_price')} (+{tracking['change_percent']:.1f}%)\n\n"
             
-            message += f"\n📦 Total Tracked: {len(trackings)}\n"
+            message += f"\n📦 Total Tracked: {changes['total']}\n"
             message += f"⏰ {datetime.now().strftime('%d %b %Y')}"
             
-            await self.bot.send_message(
+            await self._send_message(
                 chat_id=user_id,
                 text=message,
                 parse_mode="Markdown",
@@ -208,24 +289,32 @@ class Notifier:
         except Exception as e:
             logger.error(f"Error sending daily summary to {user_id}: {e}")
     
-    async def send_trending_deals(self, user_id: int, deals: List[Dict]):
-        """Send trending deals notification"""
+    @staticmethod
+    def build_trending_message(deals: List[Dict]) -> str:
+        """Render the trending deals message, shared by every recipient"""
+        message = "🔥 **Trending Deals in Last 24h**\n\n"
+        
+        for i, deal in enumerate(deals[:10], 1):
+            message += (
+                f"{i}. **{escape_markdown(deal['product_name'][:40])}**\n"
+                f"   💵 ₹{deal['current_price']} "
+                f"(📉 {deal['drop_percent']:.1f}%)\n"
+                f"   🏪 {deal['platform'].title()}\n"
+                f"   🔗 [View]({deal['affiliate_url']})\n\n"
+            )
+        
+        return message
+    
+    async def send_trending_deals(self, user_id: int, deals: List[Dict], message: Optional[str] = None):
+        """Send trending deals notification, optionally pre-rendered"""
         try:
             if not deals:
                 return
             
-            message = "🔥 **Trending Deals in Last 24h**\n\n"
+            if message is None:
+                message = self.build_trending_message(deals)
             
-            for i, deal in enumerate(deals[:10], 1):
-                message += (
-                    f"{i}. **{deal['product_name'][:40]}**\n"
-                    f"   💵 ₹{deal['current_price']} "
-                    f"(📉 {deal['drop_percent']:.1f}%)\n"
-                    f"   🏪 {deal['platform'].title()}\n"
-                    f"   🔗 [View]({deal['affiliate_url']})\n\n"
-                )
-            
-            await self.bot.send_message(
+            await self._send_message(
                 chat_id=user_id,
                 text=message,
                 parse_mode="Markdown",
@@ -235,6 +324,18 @@ class Notifier:
         except Exception as e:
             logger.error(f"Error sending trending deals: {e}")
     
+    async def broadcast_trending_deals(self, user_ids: List[int], deals: List[Dict]):
+        """Send the same trending deals to many users, rendering them once"""
+        if not deals:
+            return
+        
+        message = self.build_trending_message(deals)
+        for i in range(0, len(user_ids), self.batch_size):
+            await asyncio.gather(*[
+                self.send_trending_deals(user_id, deals, message)
+                for user_id in user_ids[i:i + self.batch_size]
+            ])
+    
     async def send_community_alert(
         self,
         user_id: int,
@@ -250,7 +351,7 @@ class Notifier:
             message = (
                 f"👥 **Community Alert**\n\n"
                 f"🔔 {shared_by_name} shared a deal!\n\n"
-                f"📦 **{product_name}**\n"
+                f"📦 **{escape_markdown(product_name)}**\n"
                 f"🏪 Platform: {platform.title()}\n"
                 f"💵 Price: ₹{price}\n"
             )
@@ -275,7 +376,7 @@ class Notifier:
                 ]
             ])
             
-            await self.bot.send_message(
+            await self._send_message(
                 chat_id=user_id,
                 text=message,
                 parse_mode="Markdown",
@@ -286,74 +387,186 @@ class Notifier:
         except Exception as e:
             logger.error(f"Error sending community alert: {e}")
     
-    async def send_batch_notifications(self, notifications: List[Dict]):
-        """Send notifications in batches to respect rate limits"""
+    async def enqueue(self, notification: Notification):
+        """
+        Queue a notification for the worker pool
+        
+        Returns as soon as it is queued; waits only while the queue is full.
+        """
+        if self.notification_queue is None:
+            self.notification_queue = asyncio.Queue(maxsize=MAX_QUEUED_NOTIFICATIONS)
+            # As many workers as sends allowed in flight
+            self._workers = [
+                asyncio.create_task(self._worker())
+                for _ in range(self.batch_size)
+            ]
+        await self.notification_queue.put(notification)
+    
+    async def _worker(self):
+        """Send queued notifications one at a time, forever"""
+        while True:
+            notification = await self.notification_queue.get()
+            try:
+                await self._dispatch(notification)
+            except Exception as e:
+                logger.error(f"Error sending notification to {notification.user_id}: {e}")
+            finally:
+                self.notification_queue.task_done()
+    
+    async def _dispatch(self, notification: Notification):
+        """Send one notification with the method for its type"""
+        if isinstance(notification, PriceAlert):
+            await self.send_price_alert(*notification)
+        elif isinstance(notification, PriceDigest):
+            await self.send_price_digest(*notification)
+        elif isinstance(notification, StockAlert):
+            await self.send_stock_alert(*notification)
+    
+    async def close(self):
+        """Stop the worker pool, dropping anything still queued"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self.notification_queue = None
+    
+    async def send_batch_notifications(self, notifications: List[Notification]):
+        """
+        Send notifications through the worker pool and wait for them
+        
+        Price alerts are coalesced per user first. The fixed pool of
+        workers bounds how many sends are in flight, and the rate limiter
+        paces them.
+        """
         try:
-            for i in range(0, len(notifications), self.batch_size):
-                batch = notifications[i:i + self.batch_size]
-                
-                for notification in batch:
-                    try:
-                        notif_type = notification.get('type')
-                        user_id = notification.get('user_id')
-                        
-                        if notif_type == 'price_alert':
-                            await self.send_price_alert(
-                                user_id=user_id,
-                                tracking=notification['tracking'],
-                                old_price=notification['old_price'],
-                                new_price=notification['new_price'],
-                                change_percent=notification['change_percent']
-                            )
-                        elif notif_type == 'stock_alert':
-                            await self.send_stock_alert(
-                                user_id=user_id,
-                                tracking=notification['tracking'],
-                                stock_status=notification['stock_status']
-                            )
-                        
-                        # Small delay to avoid rate limits
-                        await asyncio.sleep(0.05)
-                        
-                    except Exception as e:
-                        logger.error(f"Error sending notification to {user_id}: {e}")
-                        continue
-                
-                # Delay between batches
-                if i + self.batch_size < len(notifications):
-                    await asyncio.sleep(1)
+            notifications = _coalesce_price_alerts(notifications)
+            
+            async with db_manager.alert_stats.batch():
+                for notification in notifications:
+                    await self.enqueue(notification)
+                if self.notification_queue is not None:
+                    await self.notification_queue.join()
             
-            logger.info(f"Sent {len(notifications)} notifications in batches")
+            logger.info(f"Sent {len(notifications)} notifications")
             
         except Exception as e:
             logger.error(f"Error in batch notifications: {e}")
     
-    async def send_admin_announcement(self, user_ids: List[int], message: str):
-        """Send admin announcement to multiple users"""
+    async def send_admin_announcement(
+        self,
+        message: str,
+        user_ids: Optional[List[int]] = None
+    ):
+        """
+        Send admin announcement to multiple users
+        
+        Messages go out in waves of concurrent sends. The wave size is
+        steered by an AIMD controller: it grows while sends are fast and
+        halves when they slow down or hit flood control, and the rate
+        limiter keeps every send under Telegram's limits. When no user_ids
+        are given, active users are streamed from the database instead of
+        loaded up front. Users who have blocked the bot are deactivated in
+        a single write.
+        """
+        text = render_announcement(message)
+        controller = AIMDController()
+        blocked_users = []
+        
+        async def _send(user_id: int) -> bool:
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            try:
+                await self._send_message(
+                    chat_id=user_id,
+                    text=text,
+                    parse_mode="Markdown"
+                )
+                return True
+                
+            except TelegramForbiddenError:
+                blocked_users.append(user_id)
+                return False
+            except TelegramRetryAfter as e:
+                controller.record_flood()
+                logger.error(f"Failed to send announcement to {user_id}: {e}")
+                return False
+            except Exception as e:
+                logger.error(f"Failed to send announcement to {user_id}: {e}")
+                return False
+            finally:
+                controller.record(loop.time() - started)
+        
+        success_count = 0
+        failed_count = 0
+        
+        async def _send_wave(wave: List[int]):
+            nonlocal success_count, failed_count
+            results = await asyncio.gather(*[_send(user_id) for user_id in wave])
+            sent = sum(results)
+            success_count += sent
+            failed_count += len(results) - sent
+            controller.adjust()
+        
         try:
-            success_count = 0
-            failed_count = 0
-            
-            for user_id in user_ids:
-                try:
-                    await self.bot.send_message(
-                        chat_id=user_id,
-                        text=f"📢 **Admin Announcement**\n\n{message}",
-                        parse_mode="Markdown"
-                    )
-                    success_count += 1
-                    await asyncio.sleep(0.05)
-                    
-                except Exception as e:
-                    logger.error(f"Failed to send announcement to {user_id}: {e}")
-                    failed_count += 1
-            
-            logger.info(f"Announcement sent: {success_count} success, {failed_count} failed")
+            if user_ids is None:
+                cursor = db_manager.db.users.find(
+                    {"is_active": True},
+                    {"user_id": 1}
+                ).batch_size(500)
+                recipients = (user["user_id"] async for user in cursor)
+            else:
+                recipients = _iter_async(user_ids)
+            
+            wave = []
+            async for user_id in recipients:
+                wave.append(user_id)
+                if len(wave) >= controller.concurrency:
+                    await _send_wave(wave)
+                    wave = []
+            
+            if wave:
+                await _send_wave(wave)
+            
+            if blocked_users:
+                await db_manager.deactivate_users(blocked_users)
+            
+            logger.info(
+                f"Announcement sent: {success_count} success, {failed_count} failed, "
+                f"{len(blocked_users)} blocked"
+            )
             return {"success": success_count, "failed": failed_count}
             
         except Exception as e:
             logger.error(f"Error sending admin announcement: {e}")
-            return {"success": 0, "failed": len(user_ids)}
+            return {"success": success_count, "failed": failed_count}
 
 
-import asyncio
+def _coalesce_price_alerts(notifications: List[Notification]) -> List[Notification]:
+    """Merge each user's price alerts into one digest, keeping the order"""
+    alerts_by_user = defaultdict(list)
+    for notification in notifications:
+        if isinstance(notification, PriceAlert):
+            alerts_by_user[notification.user_id].append(notification)
+    
+    coalesced = []
+    for notification in notifications:
+        if not isinstance(notification, PriceAlert):
+            coalesced.append(notification)
+            continue
+        
+        alerts = alerts_by_user.pop(notification.user_id, None)
+        if alerts is None:
+            # Already merged into this user's digest
+            continue
+        if len(alerts) == 1:
+            coalesced.append(notification)
+        else:
+            coalesced.append(PriceDigest(notification.user_id, alerts))
+    
+    return coalesced
+
+
+async def _iter_async(items: List[int]):
+    """Adapt a plain list to the async iteration used for cursors"""
+    for item in items:
+        yield item
@@ -0,0 +1,110 @@
+"""
+Rate Limiter for outgoing Telegram messages
+Keeps sends under Telegram's global and per-chat limits
+"""
+import asyncio
+from collections import deque
+from typing import Dict
+
+
+class RateLimiter:
+    """
+    Spaces out sends to stay under Telegram's limits
+
+    Every send reserves the next free slot for its chat, then the next
+    free slot for the bot as a whole, sleeping until each. Reservations
+    are taken without awaiting, so concurrent senders never share a slot.
+    After a flood-control error the whole limiter can be paused.
+    """
+
+    # Drop expired per-chat slots once this many chats are tracked
+    CHAT_PRUNE_SIZE = 10000
+
+    def __init__(self, max_per_second: float = 30, chat_per_second: float = 1):
+        self.interval = 1 / max_per_second
+        self.chat_interval = 1 / chat_per_second
+        self._next_slot = 0.0
+        self._chat_next_slot: Dict[int, float] = {}
+
+    async def acquire(self, chat_id: int):
+        """Wait until a message to chat_id may be sent"""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+
+        # Wait for the chat first, so a busy chat doesn't hold a global
+        # slot that other chats could use meanwhile
+        chat_slot = max(now, self._chat_next_slot.get(chat_id, 0.0))
+        self._chat_next_slot[chat_id] = chat_slot + self.chat_interval
+        if len(self._chat_next_slot) > self.CHAT_PRUNE_SIZE:
+            self._prune(now)
+        if chat_slot > now:
+            await asyncio.sleep(chat_slot - now)
+            now = loop.time()
+
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def pause(self, seconds: float):
+        """Hold back every send not yet reserved for the given time"""
+        resume_at = asyncio.get_running_loop().time() + seconds
+        self._next_slot = max(self._next_slot, resume_at)
+
+    def _prune(self, now: float):
+        """Drop chats that are free to be sent to again"""
+        self._chat_next_slot = {
+            chat_id: slot
+            for chat_id, slot in self._chat_next_slot.items()
+            if slot > now
+        }
+
+
+class AIMDController:
+    """
+    Additive-increase / multiplicative-decrease concurrency control
+
+    Concurrency grows by a small step while recent sends are fast and is
+    halved when they slow down or Telegram reports flood control, so a
+    broadcast settles near the highest rate Telegram currently accepts.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        maximum: int = 64,
+        target_latency: float = 0.4,
+        max_latency: float = 0.8,
+        window: int = 50
+    ):
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.max_latency = max_latency
+        self._concurrency = float(initial)
+        self._latencies = deque(maxlen=window)
+        self._flooded = False
+
+    @property
+    def concurrency(self) -> int:
+        return max(int(self._concurrency), 1)
+
+    def record(self, latency: float):
+        """Record how long one send took"""
+        self._latencies.append(latency)
+
+    def record_flood(self):
+        """Note that Telegram asked us to slow down"""
+        self._flooded = True
+
+    def adjust(self):
+        """Update the concurrency after a wave of sends"""
+        mean = sum(self._latencies) / len(self._latencies) if self._latencies else 0.0
+
+        if self._flooded or mean > self.max_latency:
+            self._concurrency = max(self._concurrency / 2, 1.0)
+            # Judge the new level on its own sends only
+            self._latencies.clear()
+        elif mean < self.target_latency:
+            self._concurrency = min(self._concurrency + 0.5, self.maximum)
+
+        self._flooded = False
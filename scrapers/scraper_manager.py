@@ -5,16 +5,136 @@ import logging
 import asyncio
 import re
 import random  # --- CHANGE: Import random for delays and user-agent rotation
-from typing import Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from html import unescape
+from typing import Dict, Iterable, List, Optional, Tuple
 from urllib.parse import urlparse, parse_qs
 import aiohttp
-from bs4 import BeautifulSoup
+import soupsieve as sv
+from bs4 import BeautifulSoup, SoupStrainer
 
 logger = logging.getLogger(__name__)
 
+
+def _compile_selectors(*selectors):
+    """Compile CSS selectors once instead of on every select_one call"""
+    return tuple(sv.compile(selector) for selector in selectors)
+
+
+def _strainer(tags=(), ids=(), classes=(), attributes=()):
+    """
+    Parse only elements (with their contents) that a scraper reads
+    
+    An element is kept if its tag, id, any class or any attribute name is
+    listed, so recommendation blocks, scripts and footers are never built.
+    """
+    tags, ids, classes, attributes = map(frozenset, (tags, ids, classes, attributes))
+    
+    def keep(name, attrs):
+        # A single class arrives as a plain string, several as a list
+        element_classes = attrs.get('class') or ()
+        if isinstance(element_classes, str):
+            element_classes = element_classes.split()
+        return (
+            name in tags
+            or attrs.get('id') in ids
+            or not classes.isdisjoint(element_classes)
+            or not attributes.isdisjoint(attrs)
+        )
+    
+    return SoupStrainer(keep)
+
+
+# The first number in a price, thousands separators included: commas or
+# spaces of any kind (NBSP too), each followed by a group of 2-3 digits
+_PRICE_RE = re.compile(r'\d+(?:[,\s]\d{2,3})*(?:\.\d+)?')
+_AMAZON_ID_RE = re.compile(r'/(?:dp|product)/([A-Z0-9]{10})')
+_FLIPKART_ID_RE = re.compile(r'pid=([^&]+)')
+# Any of these in an Amazon page's availability block means out of stock
+_OUT_OF_STOCK_RE = re.compile(
+    r'currently unavailable|(?:temporarily )?out of stock',
+    re.IGNORECASE
+)
+# Generic pages are scanned as raw HTML: the first rupee amount, whether
+# written as ₹, its entity, Rs or INR, and the <title>. Script and style
+# blocks are cut first, and Rs / INR must start a word, so text like
+# "hours 24" is never read as a price.
+_PAGE_SCRIPT_RE = re.compile(r'<(script|style)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_PAGE_PRICE_RE = re.compile(r'(?:₹|&#8377;|&#x20[bB]9;|\bRs\.?|\bINR)\s?(\d[\d,]*(?:\.\d+)?)')
+_PAGE_TITLE_RE = re.compile(r'<title[^>]*>([^<]*)</title>', re.IGNORECASE)
+
+# CSS selectors, compiled once and tried in order. The name alternatives
+# all point at the same title, so each platform's are one compound selector
+# matched in a single walk; price and image keep their priority order.
+_AMAZON_NAME_SELECTORS = _compile_selectors(
+    '#productTitle, .product-title, h1.a-size-large'
+)
+_AMAZON_PRICE_SELECTORS = _compile_selectors(
+    '.a-price-whole',
+    '.a-price .a-offscreen',
+    '#priceblock_dealprice',
+    '#priceblock_ourprice',
+    '.a-price-range'
+)
+_AMAZON_IMAGE_SELECTORS = _compile_selectors(
+    '#landingImage',
+    '.a-dynamic-image',
+    'img[data-old-hires]'
+)
+_AMAZON_STOCK_SELECTOR = _compile_selectors('#availability, #outOfStock')[0]
+_FLIPKART_NAME_SELECTORS = _compile_selectors(
+    '.B_NuCI, .x2Hjhg, ._35KyD6, h1 span'
+)
+_FLIPKART_PRICE_SELECTORS = _compile_selectors(
+    '._30jeq3._16Jk6d',
+    '._30jeq3',
+    '._1_WHN1',
+    '.CEmiEU'
+)
+_FLIPKART_IMAGE_SELECTORS = _compile_selectors(
+    '._396cs4._2amPTt._3qGmMb img',
+    '._2r_T1I img',
+    '.CXW8mj img'
+)
+
+# Everything the selectors above and the stock check read
+_AMAZON_STRAINER = _strainer(
+    tags=('h1',),
+    ids=('productTitle', 'priceblock_dealprice', 'priceblock_ourprice',
+         'landingImage', 'availability', 'outOfStock'),
+    classes=('product-title', 'a-price', 'a-price-whole', 'a-price-range',
+             'a-dynamic-image'),
+    attributes=('data-old-hires',)
+)
+_FLIPKART_STRAINER = _strainer(
+    tags=('h1',),
+    classes=('B_NuCI', 'x2Hjhg', '_35KyD6', '_30jeq3', '_1_WHN1', 'CEmiEU',
+             '_396cs4', '_2r_T1I', 'CXW8mj')
+)
+
+# Statuses that mean "slow down", retried with back-off
+RETRY_STATUSES = frozenset({429, 503})
+
+# Hosts the scrapers fetch from, warmed up at startup
+PLATFORM_HOSTS = (
+    'www.amazon.in',
+    'www.flipkart.com',
+    'www.myntra.com',
+    'www.meesho.com',
+    'www.snapdeal.com',
+    'www.ebay.com',
+)
+
 class ScraperManager:
     """Manages product scraping across platforms"""
     
+    # Drop expired cached results once this many are kept
+    RESULT_CACHE_SIZE = 10000
+    # Forget the least recently fetched page's validators past this many
+    VALIDATOR_CACHE_SIZE = 10000
+    
     def __init__(self):
         self.session = None
         # --- CHANGE: Added a list of realistic User-Agents to rotate
@@ -26,8 +146,56 @@ class ScraperManager:
             'Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Mobile/15E148 Safari/604.1'
         ]
         
+        # Minimum spacing between requests to the same platform, so
+        # concurrent checks of different platforms don't wait on each other
+        self.platform_interval = 0.5
+        self._platform_locks: Dict[str, asyncio.Lock] = {}
+        self._platform_last_request: Dict[str, float] = {}
+        
+        # At most host_concurrency requests in flight per platform, and
+        # throttled requests are retried up to max_retries times
+        self.host_concurrency = 8
+        self.max_retries = 5
+        self._platform_semaphores: Dict[str, asyncio.Semaphore] = {}
+        
+        # Pages are parsed on these threads so parsing doesn't stall the
+        # loop; created on first use, like the session, and closed with it
+        self._parse_executor: Optional[ThreadPoolExecutor] = None
+        
+        # Concurrent requests for the same product share one scrape, and a
+        # successful result is reused for result_ttl seconds
+        self.result_ttl = 60
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._results: Dict[Tuple[str, str], Tuple[float, Dict]] = {}
+        # Inside batch(), results fetched since it began are reused however
+        # long the batch takes
+        self._batch_depth = 0
+        self._batch_started: Optional[float] = None
+        
+        # ETag / Last-Modified and the parsed result of each page, so an
+        # unchanged page comes back as a bodyless 304 and isn't parsed again
+        self._validators: Dict[str, Tuple[Optional[str], Optional[str], Dict]] = {}
+        
+        # Product IDs by (url, platform), a pure function of both
+        self._product_id_cache = lru_cache(maxsize=4096)(self._extract_product_id)
+        
+        # Scraper per platform
+        self._scrapers = {
+            'amazon': self._scrape_amazon,
+            'flipkart': self._scrape_flipkart,
+            'myntra': self._scrape_myntra,
+            'meesho': self._scrape_meesho,
+            'snapdeal': self._scrape_snapdeal,
+            'ebay': self._scrape_ebay
+        }
+        
     async def get_session(self):
-        """Get or create aiohttp session"""
+        """
+        Get or create aiohttp session
+        
+        Nothing here awaits, so concurrent first callers can't race to
+        create two sessions.
+        """
         if not self.session or self.session.closed: # --- CHANGE: Check if session is closed
             headers = {
                 # --- CHANGE: Select a random User-Agent for each new session
@@ -39,15 +207,69 @@ class ScraperManager:
                 'Upgrade-Insecure-Requests': '1',
                 'DNT': '1' # Do Not Track header
             }
-            connector = aiohttp.TCPConnector(limit=100, ttl_dns_cache=300, use_dns_cache=True)
+            # Idle connections are kept long enough to be reused between the
+            # spaced-out requests to the same platform, and host lookups
+            # outlive a price check cycle
+            connector = aiohttp.TCPConnector(
+                limit=100,
+                limit_per_host=self.host_concurrency,
+                ttl_dns_cache=600,
+                use_dns_cache=True,
+                keepalive_timeout=75,
+                enable_cleanup_closed=True
+            )
             self.session = aiohttp.ClientSession(headers=headers, connector=connector)
         return self.session
         
+    async def prewarm(self, timeout: float = 5):
+        """
+        Open a connection to every platform host ahead of the first check
+        
+        Fills the connector's DNS cache and keep-alive pool so the first
+        scheduled price check doesn't pay DNS and TLS setup per platform.
+        Failures are only logged; a cold host is not an error.
+        """
+        session = await self.get_session()
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+        
+        async def _warm(host: str) -> bool:
+            try:
+                async with session.head(
+                    f"https://{host}",
+                    allow_redirects=False,
+                    timeout=client_timeout
+                ):
+                    return True
+            except Exception as e:
+                logger.debug(f"Prewarm of {host} failed: {e}")
+                return False
+        
+        results = await asyncio.gather(*[_warm(host) for host in PLATFORM_HOSTS])
+        logger.info(f"Scraper prewarmed {sum(results)}/{len(PLATFORM_HOSTS)} platform hosts")
+    
     async def close_session(self):
-        """Close aiohttp session"""
+        """Close aiohttp session and the parse threads"""
         if self.session:
             await self.session.close()
             self.session = None
+        if self._parse_executor:
+            self._parse_executor.shutdown(wait=False)
+            self._parse_executor = None
+    
+    async def _wait_for_platform(self, platform: str):
+        """Wait until the platform's request spacing allows another request"""
+        lock = self._platform_locks.get(platform)
+        if lock is None:
+            lock = self._platform_locks[platform] = asyncio.Lock()
+        
+        async with lock:
+            loop = asyncio.get_running_loop()
+            last_request = self._platform_last_request.get(platform)
+            if last_request is not None:
+                wait = last_request + self.platform_interval - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            self._platform_last_request[platform] = loop.time()
     
     async def scrape_product(self, url: str, platform: str) -> Optional[Dict]:
         """
@@ -62,56 +284,214 @@ class ScraperManager:
         - stock_status: in_stock/out_of_stock
         - discount: Discount percentage
         - product_id: Platform product ID
+        
+        Trackings of the same URL share one scrape: a request for a URL
+        already being scraped waits for that result, and a successful
+        result is reused for result_ttl seconds.
+        """
+        key = (platform, url)
+        loop = asyncio.get_running_loop()
+        
+        cached = self._results.get(key)
+        if cached is not None and self._is_fresh(cached[0], loop.time()):
+            return dict(cached[1])
+        
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            result = await asyncio.shield(inflight)
+            return dict(result) if result is not None else None
+        
+        future = self._inflight[key] = loop.create_future()
+        try:
+            result = await self._scrape_product(url, platform)
+            if result and not result.get('error'):
+                self._cache_result(key, result, loop.time())
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+            if not future.done():
+                # Cancelled mid-scrape; let waiters scrape for themselves
+                future.set_result({"error": "Scrape cancelled"})
+    
+    async def scrape_many(
+        self,
+        items: Iterable[Tuple[str, str]],
+        concurrency: int = 32
+    ) -> List[Optional[Dict]]:
         """
+        Scrape many (url, platform) pairs concurrently
+        
+        At most `concurrency` scrapes run at once, on top of the per-platform
+        limits. Results come back in the order of `items`; a failed scrape
+        gives a dict with an "error" key, like scrape_product.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def _scrape(url: str, platform: str) -> Optional[Dict]:
+            async with semaphore:
+                try:
+                    return await self.scrape_product(url, platform)
+                except Exception as e:
+                    logger.error(f"Scraping error for {platform}: {e}")
+                    return {"error": str(e)}
+        
+        return await asyncio.gather(*[_scrape(url, platform) for url, platform in items])
+    
+    @asynccontextmanager
+    async def batch(self):
+        """Scrape each product at most once until the block ends"""
+        if not self._batch_depth:
+            self._batch_started = asyncio.get_running_loop().time()
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self._batch_started = None
+    
+    def _is_fresh(self, expires_at: float, now: float) -> bool:
+        """Whether a cached result may be reused"""
+        if expires_at > now:
+            return True
+        fetched_at = expires_at - self.result_ttl
+        return self._batch_started is not None and fetched_at >= self._batch_started
+    
+    def _cache_result(self, key: Tuple[str, str], result: Dict, now: float):
+        """Keep a scrape result for result_ttl seconds, dropping expired ones"""
+        if len(self._results) >= self.RESULT_CACHE_SIZE:
+            self._results = {k: v for k, v in self._results.items() if self._is_fresh(v[0], now)}
+        self._results[key] = (now + self.result_ttl, dict(result))
+    
+    async def _scrape_product(self, url: str, platform: str) -> Optional[Dict]:
+        """Scrape one product, without sharing or caching"""
+        scraper = self._scrapers.get(platform)
+        if scraper is None:
+            logger.error(f"No scraper for platform {platform}")
+            return {"error": f"Platform {platform} not supported"}
+        
         try:
             logger.info(f"Scraping {platform} product: {url}")
             
             # --- CHANGE: Introduce a randomized delay before every scrape to mimic human behavior
             await asyncio.sleep(random.uniform(1.5, 4.0))
+            await self._wait_for_platform(platform)
             
-            if platform == 'amazon':
-                return await self._scrape_amazon(url)
-            elif platform == 'flipkart':
-                return await self._scrape_flipkart(url)
-            elif platform == 'myntra':
-                return await self._scrape_myntra(url)
-            elif platform == 'meesho':
-                return await self._scrape_meesho(url)
-            elif platform == 'snapdeal':
-                return await self._scrape_snapdeal(url)
-            elif platform == 'ebay':
-                return await self._scrape_ebay(url)
-            else:
-                return {"error": f"Platform {platform} not supported"}
+            semaphore = self._platform_semaphores.get(platform)
+            if semaphore is None:
+                semaphore = self._platform_semaphores[platform] = asyncio.Semaphore(self.host_concurrency)
+            async with semaphore:
+                return await scraper(url)
             
         except Exception as e:
             logger.error(f"Scraping error for {platform}: {e}", exc_info=True)
             return {"error": str(e)}
     
+    @asynccontextmanager
+    async def _get(self, url: str):
+        """
+        GET a page, backing off and retrying while the host throttles us
+        
+        On 429/503 the wait is the Retry-After header when it gives seconds,
+        otherwise exponential, capped at a minute with jitter added. The
+        last response is yielded whatever its status. Pages fetched before
+        are requested conditionally, so an unchanged one gives a 304.
+        """
+        session = await self.get_session()
+        for attempt in range(self.max_retries + 1):
+            response = await session.get(url, headers=self._conditional_headers(url), timeout=30)
+            if response.status in RETRY_STATUSES and attempt < self.max_retries:
+                delay = self._retry_delay(response.headers.get('Retry-After'), attempt)
+                response.release()
+                logger.warning(f"HTTP {response.status} for {url}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            
+            try:
+                yield response
+            finally:
+                response.release()
+            return
+    
+    def _conditional_headers(self, url: str) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since for a page fetched before"""
+        entry = self._validators.get(url)
+        if entry is None:
+            return {}
+        
+        etag, last_modified, _ = entry
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+    
+    def _not_modified(self, url: str) -> Dict:
+        """The result parsed when an unchanged page was last fetched"""
+        entry = self._validators.get(url)
+        if entry is None:
+            # Evicted while the request was in flight
+            return {"error": "HTTP 304"}
+        return dict(entry[2])
+    
+    def _remember_page(self, url: str, headers, result: Dict):
+        """Keep a page's validators with its result, dropping the oldest page when full"""
+        self._validators.pop(url, None)
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if not (etag or last_modified) or result.get('error'):
+            return
+        
+        if len(self._validators) >= self.VALIDATOR_CACHE_SIZE:
+            del self._validators[next(iter(self._validators))]
+        self._validators[url] = (etag, last_modified, dict(result))
+    
+    @staticmethod
+    def _retry_delay(retry_after: Optional[str], attempt: int) -> float:
+        """Seconds to wait before retry number attempt + 1"""
+        try:
+            delay = float(retry_after)
+        except (TypeError, ValueError):
+            # Missing, or an HTTP date
+            delay = 2 ** attempt
+        return min(delay, 60) + random.random()
+    
+    async def _parse(self, parser, *args) -> Dict:
+        """Run a page parser on the parse threads"""
+        if self._parse_executor is None:
+            self._parse_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="scraper-parse")
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._parse_executor, parser, *args)
+    
     def extract_price(self, price_text: str) -> float:
         """Extract numeric price from text"""
         if not price_text:
             return 0.0
         
-        # Remove currency symbols and commas
-        price_clean = re.sub(r'[₹$,\s]', '', price_text)
-        
-        # Extract first number found
-        price_match = re.search(r'[\d,]+(?:\.\d+)?', price_clean)
+        # Currency symbols are skipped by the search, and only the matched
+        # number has its separators removed
+        price_match = _PRICE_RE.search(price_text)
         if price_match:
-            return float(price_match.group().replace(',', ''))
+            return float(''.join(price_match.group().replace(',', '').split()))
         return 0.0
     
     def extract_product_id(self, url: str, platform: str) -> str:
-        """Extract product ID from URL"""
+        """Extract product ID from URL, cached per URL"""
+        return self._product_id_cache(url, platform)
+    
+    def _extract_product_id(self, url: str, platform: str) -> str:
+        """Uncached extraction behind extract_product_id"""
         try:
             if platform == 'amazon':
                 # Amazon ASIN extraction
-                match = re.search(r'/(?:dp|product)/([A-Z0-9]{10})', url)
+                match = _AMAZON_ID_RE.search(url)
                 return match.group(1) if match else url.split('/')[-1]
             elif platform == 'flipkart':
                 # Flipkart product ID extraction
-                match = re.search(r'pid=([^&]+)', url)
+                match = _FLIPKART_ID_RE.search(url)
                 if match:
                     return match.group(1)
                 return url.split('/')[-1].split('?')[0]
@@ -123,155 +503,139 @@ class ScraperManager:
     async def _scrape_amazon(self, url: str) -> Dict:
         """Scrape Amazon product"""
         try:
-            session = await self.get_session()
-            async with session.get(url, timeout=30) as response:
+            async with self._get(url) as response:
+                if response.status == 304:
+                    return self._not_modified(url)
                 if response.status != 200:
                     # --- CHANGE: Provide more specific error on non-200 status
                     logger.error(f"Amazon returned non-200 status: {response.status} for URL: {url}")
                     return {"error": f"HTTP {response.status}"}
                 
-                html = await response.text()
-                soup = BeautifulSoup(html, 'lxml')
-                
-                # Extract product name
-                name_selectors = [
-                    '#productTitle',
-                    '.product-title',
-                    'h1.a-size-large'
-                ]
-                name = None
-                for selector in name_selectors:
-                    element = soup.select_one(selector)
-                    if element:
-                        name = element.get_text().strip()
-                        break
-                
-                # Extract price
-                price_selectors = [
-                    '.a-price-whole',
-                    '.a-price .a-offscreen',
-                    '#priceblock_dealprice',
-                    '#priceblock_ourprice',
-                    '.a-price-range'
-                ]
-                price = 0.0
-                for selector in price_selectors:
-                    element = soup.select_one(selector)
-                    if element:
-                        price = self.extract_price(element.get_text())
-                        if price > 0:
-                            break
-                
-                # Extract image
-                image_selectors = [
-                    '#landingImage',
-                    '.a-dynamic-image',
-                    'img[data-old-hires]'
-                ]
-                image_url = None
-                for selector in image_selectors:
-                    element = soup.select_one(selector)
-                    if element:
-                        image_url = element.get('src') or element.get('data-old-hires')
-                        break
-                
-                # Check stock status
-                stock_status = "in_stock"
-                out_of_stock_indicators = [
-                    "Currently unavailable",
-                    "Out of stock",
-                    "Temporarily out of stock"
-                ]
-                page_text = soup.get_text().lower()
-                for indicator in out_of_stock_indicators:
-                    if indicator.lower() in page_text:
-                        stock_status = "out_of_stock"
-                        break
-                
-                return {
-                    "name": name or "Amazon Product",
-                    "price": price,
-                    "original_price": price,
-                    "currency": "INR",
-                    "image_url": image_url,
-                    "stock_status": stock_status,
-                    "product_id": self.extract_product_id(url, 'amazon'),
-                    "discount": 0
-                }
-                
+                # Bytes go straight to the parser, which decodes them itself
+                html = await response.read()
+                charset = response.charset
+                headers = response.headers
+            
+            # Parsing is CPU-bound, keep it off the event loop
+            result = await self._parse(self._parse_amazon, html, charset, url)
+            self._remember_page(url, headers, result)
+            return result
+            
         except Exception as e:
             logger.error(f"Amazon scraping error: {e}")
             return {"error": str(e)}
     
+    def _parse_amazon(self, html: bytes, charset: Optional[str], url: str) -> Dict:
+        """Extract Amazon product details from a fetched page"""
+        soup = BeautifulSoup(html, 'lxml', from_encoding=charset, parse_only=_AMAZON_STRAINER)
+        
+        # Extract product name
+        name = None
+        for selector in _AMAZON_NAME_SELECTORS:
+            element = selector.select_one(soup)
+            if element:
+                name = element.get_text().strip()
+                break
+        
+        # Extract price
+        price = 0.0
+        for selector in _AMAZON_PRICE_SELECTORS:
+            element = selector.select_one(soup)
+            if element:
+                price = self.extract_price(element.get_text())
+                if price > 0:
+                    break
+        
+        # Extract image
+        image_url = None
+        for selector in _AMAZON_IMAGE_SELECTORS:
+            element = selector.select_one(soup)
+            if element:
+                image_url = element.get('src') or element.get('data-old-hires')
+                break
+        
+        # Check stock status, reading only the availability blocks
+        stock_status = "in_stock"
+        for element in _AMAZON_STOCK_SELECTOR.select(soup):
+            if _OUT_OF_STOCK_RE.search(element.get_text()):
+                stock_status = "out_of_stock"
+                break
+        
+        return {
+            "name": name or "Amazon Product",
+            "price": price,
+            "original_price": price,
+            "currency": "INR",
+            "image_url": image_url,
+            "stock_status": stock_status,
+            "product_id": self.extract_product_id(url, 'amazon'),
+            "discount": 0
+        }
+    
     async def _scrape_flipkart(self, url: str) -> Dict:
         """Scrape Flipkart product"""
         try:
-            session = await self.get_session()
-            async with session.get(url, timeout=30) as response:
+            async with self._get(url) as response:
+                if response.status == 304:
+                    return self._not_modified(url)
                 if response.status != 200:
                     logger.error(f"Flipkart returned non-200 status: {response.status} for URL: {url}")
                     return {"error": f"HTTP {response.status}"}
                 
-                html = await response.text()
-                soup = BeautifulSoup(html, 'lxml')
-                
-                # Extract product name
-                name_selectors = [
-                    '.B_NuCI',
-                    '.x2Hjhg',
-                    '._35KyD6',
-                    'h1 span'
-                ]
-                name = None
-                for selector in name_selectors:
-                    element = soup.select_one(selector)
-                    if element:
-                        name = element.get_text().strip()
-                        break
-                
-                # Extract price
-                price_selectors = [
-                    '._30jeq3._16Jk6d',
-                    '._30jeq3',
-                    '._1_WHN1',
-                    '.CEmiEU'
-                ]
-                price = 0.0
-                for selector in price_selectors:
-                    element = soup.select_one(selector)
-                    if element:
-                        price = self.extract_price(element.get_text())
-                        if price > 0:
-                            break
-                
-                # Extract image
-                image_selectors = [
-                    '._396cs4._2amPTt._3qGmMb img',
-                    '._2r_T1I img',
-                    '.CXW8mj img'
-                ]
-                image_url = None
-                for selector in image_selectors:
-                    element = soup.select_one(selector)
-                    if element:
-                        image_url = element.get('src')
-                        break
-                
-                return {
-                    "name": name or "Flipkart Product",
-                    "price": price,
-                    "original_price": price,
-                    "currency": "INR",
-                    "image_url": image_url,
-                    "stock_status": "in_stock",
-                    "product_id": self.extract_product_id(url, 'flipkart'),
-                    "discount": 0
-                }
-                
+                # Bytes go straight to the parser, which decodes them itself
+                html = await response.read()
+                charset = response.charset
+                headers = response.headers
+            
+            # Parsing is CPU-bound, keep it off the event loop
+            result = await self._parse(self._parse_flipkart, html, charset, url)
+            self._remember_page(url, headers, result)
+            return result
+            
         except Exception as e:
             logger.error(f"Flipkart scraping error: {e}")
             return {"error": str(e)}
     
+    def _parse_flipkart(self, html: bytes, charset: Optional[str], url: str) -> Dict:
+        """Extract Flipkart product details from a fetched page"""
+        soup = BeautifulSoup(html, 'lxml', from_encoding=charset, parse_only=_FLIPKART_STRAINER)
+        
+        # Extract product name
+        name = None
+        for selector in _FLIPKART_NAME_SELECTORS:
+            element = selector.select_one(soup)
+            if element:
+                name = element.get_text().strip()
+                break
+        
+        # Extract price
+        price = 0.0
+        for selector in _FLIPKART_PRICE_SELECTORS:
+            element = selector.select_one(soup)
+            if element:
+                price = self.extract_price(element.get_text())
+                if price > 0:
+                    break
+        
+        # Extract image
+        image_url = None
+        for selector in _FLIPKART_IMAGE_SELECTORS:
+            element = selector.select_one(soup)
+            if element:
+                image_url = element.get('src')
+                break
+        
+        return {
+            "name": name or "Flipkart Product",
+            "price": price,
+            "original_price": price,
+            "currency": "INR",
+            "image_url": image_url,
+            "stock_status": "in_stock",
+            "product_id": self.extract_product_id(url, 'flipkart'),
+            "discount": 0
+        }
+    
     async def _scrape_myntra(self, url: str) -> Dict:
         """Scrape Myntra product"""
         # Basic implementation - can be enhanced
@@ -292,42 +656,46 @@ class ScraperManager:
     async def _generic_scrape(self, url: str, platform: str) -> Dict:
         """Generic scraper for other platforms"""
         try:
-            session = await self.get_session()
-            async with session.get(url, timeout=30) as response:
+            async with self._get(url) as response:
+                if response.status == 304:
+                    return self._not_modified(url)
                 if response.status != 200:
                     return {"error": f"HTTP {response.status}"}
                 
-                html = await response.text()
-                soup = BeautifulSoup(html, 'lxml')
-                
-                # Generic selectors - may need adjustment per platform
-                title = soup.find('title')
-                name = title.get_text().strip() if title else f"{platform.title()} Product"
-                
-                # Try to find price with common patterns
-                price_patterns = [r'₹[\d,]+', r'Rs[\d,]+', r'INR[\d,]+']
-                price = 0.0
-                page_text = soup.get_text()
-                
-                for pattern in price_patterns:
-                    matches = re.findall(pattern, page_text)
-                    if matches:
-                        price = self.extract_price(matches[0])
-                        break
-                
-                return {
-                    "name": name[:100],  # Limit name length
-                    "price": price,
-                    "original_price": price,
-                    "currency": "INR",
-                    "image_url": None,
-                    "stock_status": "in_stock",
-                    "product_id": self.extract_product_id(url, platform),
-                    "discount": 0
-                }
-                
+                # Bytes go straight to the parser, which decodes them itself
+                html = await response.read()
+                charset = response.charset
+                headers = response.headers
+            
+            # Parsing is CPU-bound, keep it off the event loop
+            result = await self._parse(self._parse_generic, html, charset, url, platform)
+            self._remember_page(url, headers, result)
+            return result
+            
         except Exception as e:
             logger.error(f"{platform} scraping error: {e}")
             return {"error": str(e)}
+    
+    def _parse_generic(self, html: bytes, charset: Optional[str], url: str, platform: str) -> Dict:
+        """Extract generic product details from a fetched page, without building a tree"""
+        page = html.decode(charset or 'utf-8', errors='replace')
+        
+        title = _PAGE_TITLE_RE.search(page)
+        name = unescape(title.group(1)).strip() if title else ''
+        name = name or f"{platform.title()} Product"
+        
+        match = _PAGE_PRICE_RE.search(_PAGE_SCRIPT_RE.sub(' ', page))
+        price = self.extract_price(match.group(1)) if match else 0.0
+        
+        return {
+            "name": name[:100],  # Limit name length
+            "price": price,
+            "original_price": price,
+            "currency": "INR",
+            "image_url": None,
+            "stock_status": "in_stock",
+            "product_id": self.extract_product_id(url, platform),
+            "discount": 0
+        }
 
 scraper_manager = ScraperManager()
@@ -1,11 +1,25 @@
 # test_affiliate.py
 from utils.affiliate_manager import affiliate_manager
+from config.affiliate_config import (
+    AFFILIATE_CONFIG,
+    get_affiliate_tag,
+    is_affiliate_enabled,
+    get_param_name
+)
 
 def test_platform_detection():
     urls = {
         "https://www.amazon.in/dp/B09G9BL5CP": "amazon",
         "https://www.flipkart.com/product/p/itmxyz": "flipkart",
-        "https://www.myntra.com/product/123": "myntra"
+        "https://www.myntra.com/product/123": "myntra",
+        # Regional stores, subdomains and links pasted without a scheme
+        "https://www.amazon.com.au/dp/B09G9BL5CP": "amazon",
+        "https://www.amazon.com.mx/dp/B09G9BL5CP": "amazon",
+        "https://www.ebay.com.au/itm/123": "ebay",
+        "https://dl.flipkart.com/s/abc": "flipkart",
+        " amazon.in/dp/B09G9BL5CP": "amazon",
+        "https://notamazon.in/dp/B09G9BL5CP": None,
+        "https://www.example.com/?u=amazon.in": None
     }
     
     for url, expected in urls.items():
@@ -38,6 +52,21 @@ def test_affiliate_conversion():
     
     print("✅ Affiliate conversion tests passed")
 
+def test_affiliate_config_helpers():
+    for platform, config in AFFILIATE_CONFIG.items():
+        for name in (platform, platform.upper()):
+            assert get_param_name(name) == config['param_name']
+            assert is_affiliate_enabled(name) == config['enabled']
+            expected_tag = config['tag'] if config['enabled'] else ''
+            assert get_affiliate_tag(name) == expected_tag
+    
+    assert get_param_name("unknown") == "tag"
+    assert not is_affiliate_enabled("unknown")
+    assert get_affiliate_tag("unknown") == ""
+    
+    print("✅ Affiliate config helper tests passed")
+
 if __name__ == "__main__":
     test_platform_detection()
     test_affiliate_conversion()
+    test_affiliate_config_helpers()
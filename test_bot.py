@@ -27,6 +27,7 @@ async def test_imports():
         from utils.affiliate_manager import affiliate_manager
         from config.affiliate_config import AFFILIATE_CONFIG
         from notifications.notifier import Notifier
+        from notifications.rate_limiter import RateLimiter
         from keyboards.inline_keyboards import get_tracking_keyboard
         
         # Test handlers
@@ -47,6 +48,8 @@ async def test_affiliate_manager():
     logger.info("Testing affiliate manager...")
     
     try:
+        from utils.affiliate_manager import affiliate_manager
+        
         # Test URL detection
         amazon_url = "https://www.amazon.in/dp/B08N5WRWNW"
         flipkart_url = "https://www.flipkart.com/product/p/itmexample"
@@ -79,6 +82,8 @@ async def test_scraper_basic():
     logger.info("Testing scraper manager...")
     
     try:
+        from scrapers.scraper_manager import scraper_manager
+        
         # Test with a simple URL (won't actually scrape, just test structure)
         test_url = "https://www.example.com/product"
         
@@ -106,6 +111,8 @@ async def test_database_models():
     logger.info("Testing database models...")
     
     try:
+        from database.models import ProductTracking, User
+        
         # Test ProductTracking model
         tracking_data = {
             "user_id": 123456789,
@@ -157,16 +164,20 @@ async def run_all_tests():
     passed = 0
     total = len(tests)
     
-    for test_name, test_func in tests:
-        logger.info(f"\n--- Testing {test_name} ---")
-        try:
-            if await test_func():
-                passed += 1
-                logger.info(f"✅ {test_name}: PASSED")
-            else:
-                logger.error(f"❌ {test_name}: FAILED")
-        except Exception as e:
-            logger.error(f"❌ {test_name}: FAILED with exception: {e}")
+    # The tests share nothing, so they run concurrently
+    results = await asyncio.gather(
+        *(test_func() for _, test_func in tests),
+        return_exceptions=True
+    )
+    
+    for (test_name, _), result in zip(tests, results):
+        if isinstance(result, Exception):
+            logger.error(f"❌ {test_name}: FAILED with exception: {result}")
+        elif result:
+            passed += 1
+            logger.info(f"✅ {test_name}: PASSED")
+        else:
+            logger.error(f"❌ {test_name}: FAILED")
     
     logger.info(f"\n{'='*50}")
     logger.info(f"TEST RESULTS: {passed}/{total} tests passed")
@@ -2,13 +2,25 @@
 Affiliate Link Manager for Price Tracker Bot
 Handles conversion of product URLs to affiliate links
 """
-import re
+from functools import lru_cache
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
-from typing import Optional, Dict
+from typing import Optional, Dict, NamedTuple, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+class _Converter(NamedTuple):
+    """A platform's affiliate settings, prepared once for conversion"""
+    param_name: str
+    tag: str
+    # "param=tag", ready to append to a query
+    encoded_param: str
+    strip_params: Tuple[str, ...]
+    # "name=" for every parameter whose presence needs a full rebuild
+    query_markers: Tuple[str, ...]
+
+
 class AffiliateManager:
     """
     Manages affiliate link conversion for various e-commerce platforms
@@ -19,7 +31,9 @@ class AffiliateManager:
         self.affiliate_config = {
             'amazon': {
                 'tag': 'yourtag-21',  # Replace with your Amazon affiliate tag
-                'param_name': 'tag'
+                'param_name': 'tag',
+                # Tracking parameters dropped from converted links
+                'strip_params': ('qid', 'sr', 'ref', 'pd_rd_w', 'pd_rd_r', 'pd_rd_wg')
             },
             'flipkart': {
                 'tag': 'youraffid',  # Replace with your Flipkart affiliate ID
@@ -43,32 +57,30 @@ class AffiliateManager:
             }
         }
         
-        # Platform domain patterns
+        # Platform domains; subdomains of these, and regional stores that
+        # add a country code (amazon.com.au), match too
         self.platform_patterns = {
-            'amazon': [
-                r'amazon\.in',
-                r'amazon\.com',
-                r'amzn\.to',
-                r'amzn\.in'
-            ],
-            'flipkart': [
-                r'flipkart\.com',
-                r'fkrt\.it'
-            ],
-            'myntra': [
-                r'myntra\.com'
-            ],
-            'meesho': [
-                r'meesho\.com'
-            ],
-            'snapdeal': [
-                r'snapdeal\.com'
-            ],
-            'ebay': [
-                r'ebay\.in',
-                r'ebay\.com'
-            ]
+            'amazon': ('amazon.in', 'amazon.com', 'amzn.to', 'amzn.in'),
+            'flipkart': ('flipkart.com', 'fkrt.it'),
+            'myntra': ('myntra.com',),
+            'meesho': ('meesho.com',),
+            'snapdeal': ('snapdeal.com',),
+            'ebay': ('ebay.in', 'ebay.com')
         }
+        
+        # Domains with a leading dot, so one endswith on ".<host>" matches
+        # a domain and its subdomains but not e.g. "notamazon.in"
+        self._platform_suffixes = {
+            platform: tuple(f".{domain}" for domain in domains)
+            for platform, domains in self.platform_patterns.items()
+        }
+        
+        self._converters = self._build_converters()
+        
+        # Converted URLs by (url, platform); cleared when the config changes
+        self._affiliate_url_cache = lru_cache(maxsize=50000)(self._convert_to_affiliate)
+        # Platforms by URL; the patterns never change at runtime
+        self._platform_cache = lru_cache(maxsize=4096)(self._detect_platform)
     
     def detect_platform(self, url: str) -> Optional[str]:
         """
@@ -80,19 +92,32 @@ class AffiliateManager:
         Returns:
             Platform name or None
         """
-        url_lower = url.lower()
-        
-        for platform, patterns in self.platform_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, url_lower):
-                    return platform
-        
+        return self._platform_cache(url)
+    
+    def _detect_platform(self, url: str) -> Optional[str]:
+        """Uncached detection behind detect_platform"""
+        # Links pasted without a scheme still have a host
+        url = url.strip()
+        if '//' not in url:
+            url = f"//{url}"
+        host = f".{(urlparse(url).hostname or '')}"
+        
+        # The host without a trailing country code, for regional stores
+        regional, _, country = host.rpartition('.')
+        if len(country) != 2:
+            regional = host
+        
+        for platform, suffixes in self._platform_suffixes.items():
+            if host.endswith(suffixes) or regional.endswith(suffixes):
+                return platform
         return None
     
     def convert_to_affiliate(self, url: str, platform: Optional[str] = None) -> str:
         """
         Convert a regular product URL to affiliate link
         
+        Results are cached, the same product is often tracked by many users.
+        
         Args:
             url: Original product URL
             platform: Platform name (auto-detected if None)
@@ -100,6 +125,10 @@ class AffiliateManager:
         Returns:
             Affiliate URL
         """
+        return self._affiliate_url_cache(url, platform)
+    
+    def _convert_to_affiliate(self, url: str, platform: Optional[str]) -> str:
+        """Uncached conversion behind convert_to_affiliate"""
         try:
             # Auto-detect platform if not provided
             if platform is None:
@@ -109,43 +138,53 @@ class AffiliateManager:
                 logger.warning(f"Unknown platform for URL: {url}")
                 return url
             
-            # Get affiliate config for platform
-            config = self.affiliate_config.get(platform)
-            if not config:
+            converter = self._converters.get(platform)
+            if converter is None:
                 logger.warning(f"No affiliate config for platform: {platform}")
                 return url
             
-            # Platform-specific conversion
-            if platform == 'amazon':
-                return self._convert_amazon(url, config)
-            elif platform == 'flipkart':
-                return self._convert_flipkart(url, config)
-            elif platform == 'myntra':
-                return self._convert_myntra(url, config)
-            elif platform == 'meesho':
-                return self._convert_meesho(url, config)
-            elif platform == 'snapdeal':
-                return self._convert_snapdeal(url, config)
-            elif platform == 'ebay':
-                return self._convert_ebay(url, config)
-            else:
-                return url
-                
+            return self._convert(url, converter)
+            
         except Exception as e:
             logger.error(f"Error converting URL to affiliate: {e}")
             return url
     
-    def _convert_amazon(self, url: str, config: Dict) -> str:
-        """Convert Amazon URL to affiliate link"""
+    def _build_converters(self) -> Dict[str, _Converter]:
+        """Prepare every complete platform config for conversion"""
+        converters = {}
+        for platform, config in self.affiliate_config.items():
+            if 'tag' not in config or 'param_name' not in config:
+                continue
+            
+            param_name, tag = config['param_name'], config['tag']
+            strip_params = tuple(config.get('strip_params', ()))
+            converters[platform] = _Converter(
+                param_name=param_name,
+                tag=tag,
+                encoded_param=urlencode({param_name: tag}),
+                strip_params=strip_params,
+                query_markers=tuple(f"{name}=" for name in (param_name, *strip_params))
+            )
+        return converters
+    
+    def _convert(self, url: str, converter: _Converter) -> str:
+        """Set the affiliate parameter and drop the platform's tracking parameters"""
+        # Most links only need the parameter appended, which skips parsing
+        if '#' not in url:
+            if '?' not in url:
+                return f"{url}?{converter.encoded_param}"
+            
+            query = url.partition('?')[2]
+            if query and not any(marker in query for marker in converter.query_markers):
+                return f"{url}&{converter.encoded_param}"
+        
         parsed = urlparse(url)
         query_params = parse_qs(parsed.query)
         
         # Add or update affiliate tag
-        query_params[config['param_name']] = [config['tag']]
+        query_params[converter.param_name] = [converter.tag]
         
-        # Remove unwanted tracking parameters
-        params_to_remove = ['qid', 'sr', 'ref', 'pd_rd_w', 'pd_rd_r', 'pd_rd_wg']
-        for param in params_to_remove:
+        for param in converter.strip_params:
             query_params.pop(param, None)
         
         # Rebuild URL
@@ -161,102 +200,6 @@ class AffiliateManager:
         
         return new_url
     
-    def _convert_flipkart(self, url: str, config: Dict) -> str:
-        """Convert Flipkart URL to affiliate link"""
-        parsed = urlparse(url)
-        query_params = parse_qs(parsed.query)
-        
-        # Add affiliate ID
-        query_params[config['param_name']] = [config['tag']]
-        
-        new_query = urlencode(query_params, doseq=True)
-        new_url = urlunparse((
-            parsed.scheme,
-            parsed.netloc,
-            parsed.path,
-            parsed.params,
-            new_query,
-            ''
-        ))
-        
-        return new_url
-    
-    def _convert_myntra(self, url: str, config: Dict) -> str:
-        """Convert Myntra URL to affiliate link"""
-        parsed = urlparse(url)
-        query_params = parse_qs(parsed.query)
-        
-        query_params[config['param_name']] = [config['tag']]
-        
-        new_query = urlencode(query_params, doseq=True)
-        new_url = urlunparse((
-            parsed.scheme,
-            parsed.netloc,
-            parsed.path,
-            parsed.params,
-            new_query,
-            ''
-        ))
-        
-        return new_url
-    
-    def _convert_meesho(self, url: str, config: Dict) -> str:
-        """Convert Meesho URL to affiliate link"""
-        parsed = urlparse(url)
-        query_params = parse_qs(parsed.query)
-        
-        query_params[config['param_name']] = [config['tag']]
-        
-        new_query = urlencode(query_params, doseq=True)
-        new_url = urlunparse((
-            parsed.scheme,
-            parsed.netloc,
-            parsed.path,
-            parsed.params,
-            new_query,
-            ''
-        ))
-        
-        return new_url
-    
-    def _convert_snapdeal(self, url: str, config: Dict) -> str:
-        """Convert Snapdeal URL to affiliate link"""
-        parsed = urlparse(url)
-        query_params = parse_qs(parsed.query)
-        
-        query_params[config['param_name']] = [config['tag']]
-        
-        new_query = urlencode(query_params, doseq=True)
-        new_url = urlunparse((
-            parsed.scheme,
-            parsed.netloc,
-            parsed.path,
-            parsed.params,
-            new_query,
-            ''
-        ))
-        
-        return new_url
-    
-    def _convert_ebay(self, url: str, config: Dict) -> str:
-        """Convert eBay URL to affiliate link"""
-        parsed = urlparse(url)
-        query_params = parse_qs(parsed.query)
-        
-        query_params[config['param_name']] = [config['tag']]
-        
-        new_query = urlencode(query_params, doseq=True)
-        new_url = urlunparse((
-            parsed.scheme,
-            parsed.netloc,
-            parsed.path,
-            parsed.params,
-            new_query,
-            ''
-        ))
-        
-        return new_url
-    
     def update_affiliate_config(self, platform: str, tag: str, param_name: str = None):
         """
         Update affiliate configuration for a platform
@@ -274,6 +217,8 @@ class AffiliateManager:
         if param_name:
             self.affiliate_config[platform]['param_name'] = param_name
         
+        self._converters = self._build_converters()
+        self._affiliate_url_cache.cache_clear()
         logger.info(f"Updated affiliate config for {platform}")
 
 # Global instance